@@ -0,0 +1,77 @@
+"""Base tables
+
+Creates users, jobcards and serviceorders as they were before the initial
+migration, which assumed they already existed, so that `alembic upgrade
+head` builds a fresh database from nothing.
+
+Revision ID: 0b7c5e2a9d14
+Revises:
+Create Date: 2025-07-15 17:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b7c5e2a9d14'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password', sa.String(), nullable=False),
+        sa.Column('role', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    op.create_table(
+        'jobcards',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('engineer_name', sa.String(), nullable=True),
+        sa.Column('equipment_name', sa.String(), nullable=True),
+        sa.Column('maintenance_type', sa.String(), nullable=True),
+        sa.Column('date_of_service', sa.DateTime(), nullable=True),
+        sa.Column('job_description', sa.Text(), nullable=True),
+        sa.Column('spare_parts_used', sa.Text(), nullable=True),
+        sa.Column('file_path', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_jobcards_id', 'jobcards', ['id'], unique=False)
+
+    op.create_table(
+        'serviceorders',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('engineer_name', sa.String(), nullable=False),
+        sa.Column('site_hospital', sa.String(), nullable=False),
+        sa.Column('mission_purpose', sa.Text(), nullable=True),
+        sa.Column('spare_parts', sa.Text(), nullable=True),
+        sa.Column('arrival_date', sa.Date(), nullable=True),
+        sa.Column('return_date', sa.Date(), nullable=True),
+        sa.Column('mission_fee', sa.Float(), nullable=True),
+        sa.Column('transport_fee', sa.Float(), nullable=True),
+        sa.Column('total_cost', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_serviceorders_id', 'serviceorders', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_serviceorders_id', table_name='serviceorders')
+    op.drop_table('serviceorders')
+    op.drop_index('ix_jobcards_id', table_name='jobcards')
+    op.drop_table('jobcards')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,32 @@
+"""Listing keyset indexes
+
+Revision ID: 3f2a9c1d7b40
+Revises: 69099db00b48
+Create Date: 2026-10-18 09:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d7b40'
+down_revision: Union[str, Sequence[str], None] = '69099db00b48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_jobcards_user_date_id', 'jobcards', ['user_id', 'date_of_service', 'id'], unique=False)
+    op.create_index('ix_serviceorders_user_arrival_id', 'serviceorders', ['user_id', 'arrival_date', 'id'], unique=False)
+    op.create_index('ix_users_listing', 'users', ['id', 'email', 'role'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_listing', table_name='users')
+    op.drop_index('ix_serviceorders_user_arrival_id', table_name='serviceorders')
+    op.drop_index('ix_jobcards_user_date_id', table_name='jobcards')
@@ -0,0 +1,77 @@
+"""Full-text search indexes
+
+Revision ID: 5e9b3a7c1d24
+Revises: c4d7e2f91a06
+Create Date: 2026-10-18 15:02:47.193604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9b3a7c1d24'
+down_revision: Union[str, Sequence[str], None] = 'c4d7e2f91a06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> (title column ranked 'A', other searchable columns ranked 'B')
+SOURCES = {
+    'jobcards': ('equipment_name', ('job_description', 'spare_parts_used')),
+    'serviceorders': ('site_hospital', ('mission_purpose', 'spare_parts')),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        for table, (title, fields) in SOURCES.items():
+            vector = f"setweight(to_tsvector('english', coalesce({title}, '')), 'A')"
+            for field in fields:
+                vector += f" || setweight(to_tsvector('english', coalesce({field}, '')), 'B')"
+            op.execute(f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED")
+            op.execute(f"CREATE INDEX ix_{table}_search ON {table} USING gin (search_vector)")
+        return
+
+    for table, (title, fields) in SOURCES.items():
+        columns = [title, *fields]
+        names = ', '.join(columns)
+        new = ', '.join(f'new.{c}' for c in columns)
+        old = ', '.join(f'old.{c}' for c in columns)
+        fts = f'{table}_fts'
+        op.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='id', "
+            "tokenize='porter unicode61')"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+            f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END"
+        )
+        # Index the rows that already exist.
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in SOURCES:
+            op.execute(f"DROP INDEX ix_{table}_search")
+            op.execute(f"ALTER TABLE {table} DROP COLUMN search_vector")
+        return
+
+    for table in SOURCES:
+        fts = f'{table}_fts'
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER {fts}_{suffix}")
+        op.execute(f"DROP TABLE {fts}")
@@ -1,7 +1,7 @@
 """Initial migration
 
 Revision ID: 69099db00b48
-Revises: 
+Revises: 0b7c5e2a9d14
 Create Date: 2025-07-15 17:27:50.546639
 
 """
@@ -13,13 +13,20 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = '69099db00b48'
-down_revision: Union[str, Sequence[str], None] = None
+down_revision: Union[str, Sequence[str], None] = '0b7c5e2a9d14'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
     """Upgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite cannot add a foreign key to an existing table; batch mode rebuilds it.
+        for table in ('jobcards', 'serviceorders'):
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+                batch_op.create_foreign_key(f'fk_{table}_user_id_users', 'users', ['user_id'], ['id'])
+        return
     # ### commands auto generated by Alembic - please adjust! ###
     op.add_column('jobcards', sa.Column('user_id', sa.Integer(), nullable=True))
     op.create_foreign_key(None, 'jobcards', 'users', ['user_id'], ['id'])
@@ -30,6 +37,12 @@ def upgrade() -> None:
 
 def downgrade() -> None:
     """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in ('serviceorders', 'jobcards'):
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.drop_constraint(f'fk_{table}_user_id_users', type_='foreignkey')
+                batch_op.drop_column('user_id')
+        return
     # ### commands auto generated by Alembic - please adjust! ###
     op.drop_constraint(None, 'serviceorders', type_='foreignkey')
     op.drop_column('serviceorders', 'user_id')
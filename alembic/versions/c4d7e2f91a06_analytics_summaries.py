@@ -0,0 +1,58 @@
+"""Analytics summary tables
+
+Revision ID: c4d7e2f91a06
+Revises: 8b1e4d6a2c93
+Create Date: 2026-10-18 13:40:02.518377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d7e2f91a06'
+down_revision: Union[str, Sequence[str], None] = '8b1e4d6a2c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('maintenance_summary',
+    sa.Column('equipment_name', sa.String(), nullable=False),
+    sa.Column('maintenance_type', sa.String(), nullable=False),
+    sa.Column('job_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('equipment_name', 'maintenance_type')
+    )
+    op.create_table('mission_spend_summary',
+    sa.Column('site_hospital', sa.String(), nullable=False),
+    sa.Column('month', sa.String(length=7), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('mission_fee', sa.Float(), nullable=False),
+    sa.Column('transport_fee', sa.Float(), nullable=False),
+    sa.Column('total_cost', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('site_hospital', 'month')
+    )
+    # Populate from existing history; afterwards the app keeps them current.
+    op.execute(
+        "INSERT INTO maintenance_summary (equipment_name, maintenance_type, job_count) "
+        "SELECT coalesce(equipment_name, ''), coalesce(maintenance_type, ''), count(*) "
+        "FROM jobcards GROUP BY 1, 2"
+    )
+    month = "strftime('%Y-%m', arrival_date)" if op.get_bind().dialect.name == "sqlite" \
+        else "to_char(arrival_date, 'YYYY-MM')"
+    op.execute(
+        "INSERT INTO mission_spend_summary "
+        "(site_hospital, month, order_count, mission_fee, transport_fee, total_cost) "
+        f"SELECT coalesce(site_hospital, ''), coalesce({month}, ''), count(*), "
+        "coalesce(sum(mission_fee), 0), coalesce(sum(transport_fee), 0), coalesce(sum(total_cost), 0) "
+        "FROM serviceorders GROUP BY 1, 2"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('mission_spend_summary')
+    op.drop_table('maintenance_summary')
@@ -0,0 +1,28 @@
+"""User data version for page caching
+
+Revision ID: e3a7c9d1f562
+Revises: d81f4c2b7e55
+Create Date: 2026-10-18 18:02:44.117205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7c9d1f562'
+down_revision: Union[str, Sequence[str], None] = 'd81f4c2b7e55'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'data_version')
@@ -0,0 +1,63 @@
+"""Cascade user deletes to job cards and service orders
+
+Revision ID: f4b2d8e6a913
+Revises: e3a7c9d1f562
+Create Date: 2026-10-18 19:24:10.582317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b2d8e6a913'
+down_revision: Union[str, Sequence[str], None] = 'e3a7c9d1f562'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('jobcards', 'serviceorders')
+# Gives the unnamed foreign keys SQLite reflects a name batch mode can drop.
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def _user_fk_name(table):
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys(table):
+        if fk['constrained_columns'] == ['user_id']:
+            return fk['name'] or f'fk_{table}_user_id_users'
+    return None
+
+
+def _replace_user_fk(ondelete):
+    bind = op.get_bind()
+    for table in TABLES:
+        old_name = _user_fk_name(table)
+        new_name = old_name or f'{table}_user_id_fkey'
+        if bind.dialect.name != 'sqlite':
+            if old_name:
+                op.drop_constraint(old_name, table, type_='foreignkey')
+            op.create_foreign_key(new_name, table, 'users', ['user_id'], ['id'], ondelete=ondelete)
+            continue
+
+        # SQLite rebuilds the table, which drops its triggers (the FTS sync ones); put them back.
+        triggers = bind.execute(
+            sa.text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :table"),
+            {'table': table},
+        ).scalars().all()
+        with op.batch_alter_table(table, recreate='always', naming_convention=NAMING_CONVENTION) as batch_op:
+            if old_name:
+                batch_op.drop_constraint(old_name, type_='foreignkey')
+            batch_op.create_foreign_key(f'fk_{table}_user_id_users', 'users', ['user_id'], ['id'], ondelete=ondelete)
+        for sql in triggers:
+            op.execute(sql)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _replace_user_fk('CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _replace_user_fk(None)
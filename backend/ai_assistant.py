@@ -1,30 +1,263 @@
-import httpx
+import asyncio
+import json
+import logging
 import os
+import random
+import time
+
+from backend import metrics
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama3-8b-8192")
 
-async def ask_ai(query: str, manual_content: str) -> str:
-    if not GROQ_API_KEY:
-        return "AI service not available (missing API key)."
-
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    messages = [
-        {"role": "system", "content": f"You are a biomedical equipment assistant. Here is the equipment manual:\n{manual_content}"},
+# Upstream client tuning (override via environment)
+AI_HTTP2 = os.getenv("AI_HTTP2", "0") == "1"
+AI_CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", "5"))
+AI_READ_TIMEOUT = float(os.getenv("AI_READ_TIMEOUT", "60"))
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "20"))
+AI_MAX_KEEPALIVE = int(os.getenv("AI_MAX_KEEPALIVE", "10"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_MAX_QUEUE = int(os.getenv("AI_MAX_QUEUE", "32"))
+AI_QUEUE_TIMEOUT = float(os.getenv("AI_QUEUE_TIMEOUT", "30"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+AI_BACKOFF_BASE = float(os.getenv("AI_BACKOFF_BASE", "0.5"))
+AI_BACKOFF_MAX = float(os.getenv("AI_BACKOFF_MAX", "8"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+
+class AIAssistantError(Exception):
+    pass
+
+
+class LLMClient:
+    """App-lifetime pooled HTTP client for the chat completions API.
+
+    Limits in-flight upstream calls with a semaphore, rejects callers once more
+    than ``max_queue`` are waiting, and retries 429/5xx and transport errors
+    with jittered exponential backoff. The app lifespan creates the client at
+    startup (``start``) and closes it at shutdown; calls made without a
+    lifespan create it on first use. httpx is imported in ``start``, so
+    importing this module stays cheap.
+    """
+
+    def __init__(self, url: str = GROQ_API_URL, max_concurrency: int = AI_MAX_CONCURRENCY,
+                 max_queue: int = AI_MAX_QUEUE, max_retries: int = AI_MAX_RETRIES):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self._client = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self.in_flight = 0
+        self.rejected = 0
+        self.retries = 0
+
+    async def start(self):
+        import httpx
+
+        if self._client is not None:
+            return
+        http2 = AI_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("AI_HTTP2=1 but the 'h2' package is not installed; using HTTP/1.1")
+                http2 = False
+        # The semaphore is bound to the running loop, so create it with the client.
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(AI_READ_TIMEOUT, connect=AI_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=AI_MAX_CONNECTIONS,
+                max_keepalive_connections=AI_MAX_KEEPALIVE,
+            ),
+        )
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _acquire(self):
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise AIAssistantError("AI assistant is busy, please try again shortly.")
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), AI_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AIAssistantError("AI assistant is busy, please try again shortly.")
+        finally:
+            self._waiting -= 1
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return min(float(retry_after), AI_BACKOFF_MAX)
+                except ValueError:
+                    pass
+        # Full jitter: uniform over [0, base * 2^attempt], capped.
+        return random.uniform(0, min(AI_BACKOFF_MAX, AI_BACKOFF_BASE * (2 ** attempt)))
+
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {GROQ_API_KEY}",
+            "Content-Type": "application/json"
+        }
+
+    async def post(self, payload: dict) -> dict:
+        import httpx
+
+        if self._client is None:
+            await self.start()
+        headers = self._headers()
+
+        await self._acquire()
+        self.in_flight += 1
+        try:
+            attempt = 0
+            while True:
+                response = None
+                try:
+                    response = await self._client.post(self.url, headers=headers, json=payload)
+                except httpx.TransportError as e:
+                    if attempt >= self.max_retries:
+                        raise AIAssistantError(f"Error contacting AI assistant: {str(e)}") from e
+                else:
+                    if response.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                        break
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, response))
+                attempt += 1
+
+            if response.status_code >= 400:
+                raise AIAssistantError(
+                    f"Error contacting AI assistant: upstream returned HTTP {response.status_code}"
+                )
+            try:
+                return response.json()
+            except ValueError as e:
+                raise AIAssistantError("Error contacting AI assistant: invalid JSON from upstream") from e
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def stream(self, payload: dict):
+        """Yield content deltas from a ``stream: true`` completion.
+
+        Retries happen only before the first token is received; once output has
+        been yielded a failure is raised to the caller. Closing the generator
+        (e.g. on client disconnect) closes the upstream response.
+        """
+        import httpx
+
+        if self._client is None:
+            await self.start()
+        headers = self._headers()
+        payload = {**payload, "stream": True}
+
+        await self._acquire()
+        self.in_flight += 1
+        try:
+            attempt = 0
+            yielded = False
+            while True:
+                retry_response = None
+                try:
+                    async with self._client.stream("POST", self.url, headers=headers, json=payload) as response:
+                        if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                            retry_response = response
+                        elif response.status_code >= 400:
+                            raise AIAssistantError(
+                                f"Error contacting AI assistant: upstream returned HTTP {response.status_code}"
+                            )
+                        else:
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[5:].strip()
+                                if data == "[DONE]":
+                                    return
+                                try:
+                                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                                except (ValueError, KeyError, IndexError, TypeError) as e:
+                                    raise AIAssistantError(
+                                        "Error contacting AI assistant: invalid stream chunk from upstream"
+                                    ) from e
+                                if delta:
+                                    yielded = True
+                                    yield delta
+                            return
+                except httpx.TransportError as e:
+                    if yielded or attempt >= self.max_retries:
+                        raise AIAssistantError(f"Error contacting AI assistant: {str(e)}") from e
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, retry_response))
+                attempt += 1
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "retries": self.retries,
+        }
+
+
+llm_client = LLMClient()
+
+
+def build_messages(query: str, manual_content: str) -> list:
+    return [
+        {"role": "system", "content": f"You are a biomedical equipment assistant. Here are the relevant sections of the equipment manual:\n{manual_content}"},
         {"role": "user", "content": query}
     ]
 
+
+async def request_completion(query: str, manual_content: str) -> str:
+    if not GROQ_API_KEY:
+        raise AIAssistantError("AI service not available (missing API key).")
+
+    with metrics.timed(metrics.LLM_DURATION, "completion"):
+        result = await llm_client.post({
+            "model": GROQ_MODEL,
+            "messages": build_messages(query, manual_content),
+            "temperature": 0.7
+        })
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json={
-                "model": "llama3-8b-8192",
-                "messages": messages,
-                "temperature": 0.7
-            })
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-    except Exception as e:
-        return f"Error contacting AI assistant: {str(e)}"
+        return result["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError) as e:
+        raise AIAssistantError(f"Error contacting AI assistant: unexpected response {str(e)}") from e
+
+
+async def stream_completion(query: str, manual_content: str):
+    if not GROQ_API_KEY:
+        raise AIAssistantError("AI service not available (missing API key).")
+
+    started = time.perf_counter()
+    first = True
+    with metrics.timed(metrics.LLM_DURATION, "stream"):
+        async for token in llm_client.stream({
+            "model": GROQ_MODEL,
+            "messages": build_messages(query, manual_content),
+            "temperature": 0.7
+        }):
+            if first:
+                metrics.LLM_FIRST_TOKEN.observe(time.perf_counter() - started)
+                first = False
+            yield token
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+
+from backend.ai_assistant import AIAssistantError, request_completion
+
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "3600"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "1000"))
+AI_CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _WS_RE.sub(" ", query).strip().rstrip("?!. ").lower()
+
+
+class AnswerCache:
+    """LRU + TTL cache of assistant answers with a memory cap.
+
+    Entries are keyed on (instrument, manual content hash, normalized query).
+    Concurrent misses for the same key share a single upstream call.
+    """
+
+    def __init__(self, ttl: float = AI_CACHE_TTL, max_entries: int = AI_CACHE_MAX_ENTRIES,
+                 max_bytes: int = AI_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, size, answer)
+        self._inflight = {}            # key -> asyncio.Task running the fetch
+        self._generation = {}          # instrument -> int, bumped on invalidate
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(instrument: str, content_hash: str, query: str) -> tuple:
+        return (instrument, content_hash, normalize_query(query))
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def lookup(self, key):
+        """Like ``get`` but counted in the hit/miss statistics."""
+        answer = self.get(key)
+        if answer is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return answer
+
+    def put(self, key, answer: str):
+        size = len(answer.encode("utf-8")) + sum(len(part) for part in key)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, answer)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, instrument: str):
+        self._generation[instrument] = self._generation.get(instrument, 0) + 1
+        for key in [k for k in self._entries if k[0] == instrument]:
+            self._drop(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    async def get_or_fetch(self, key, fetch):
+        """Return the cached answer for ``key`` or await ``fetch()`` exactly once per key.
+
+        The fetch runs in a task of its own that every caller awaits through
+        ``shield``: a caller that is cancelled (its client went away, it timed
+        out) stops waiting, but the others still get the answer.
+        """
+        answer = self.get(key)
+        if answer is not None:
+            self.hits += 1
+            return answer
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            generation = self._generation.get(key[0], 0)
+            task = asyncio.get_running_loop().create_task(self._fetch(key, fetch, generation))
+            task.add_done_callback(lambda t: self._fetched(key, t))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, fetch, generation: int) -> str:
+        answer = await fetch()
+        if self._generation.get(key[0], 0) == generation:
+            self.put(key, answer)
+        return answer
+
+    def _fetched(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark retrieved so a failure whose waiters were all cancelled is not logged.
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+answer_cache = AnswerCache()
+
+
+async def ask_ai_cached(instrument: str, content_hash: str, query: str, manual_content: str) -> str:
+    """Answer ``query`` through the cache. Errors are returned as their message and never cached."""
+    key = answer_cache.make_key(instrument, content_hash, query)
+    try:
+        return await answer_cache.get_or_fetch(key, lambda: request_completion(query, manual_content))
+    except AIAssistantError as e:
+        return str(e)
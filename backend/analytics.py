@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import defaultdict
+
+from sqlalchemy import delete, func, insert, select, text
+
+from backend.db.models import JobCard, MaintenanceSummary, MissionSpendSummary, ServiceOrder
+
+SPEND_FIELDS = ("mission_fee", "transport_fee", "total_cost")
+
+
+def _get(row, name):
+    return row.get(name) if isinstance(row, dict) else getattr(row, name)
+
+
+def _month(value) -> str:
+    return value.strftime("%Y-%m") if value else ""
+
+
+def _month_expr(dialect: str, column):
+    if dialect == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def _upsert(db, model, keys, values: list):
+    """INSERT ... ON CONFLICT DO UPDATE adding each value column onto the stored one."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_
+    stmt = insert_(model).values(values)
+    added = {
+        name: getattr(model, name) + getattr(stmt.excluded, name)
+        for name in values[0] if name not in keys
+    }
+    return stmt.on_conflict_do_update(index_elements=keys, set_=added)
+
+
+# ---------------------- Incremental updates ---------------------
+# Called inside the writer's transaction, so the summaries commit (or roll back)
+# together with the rows they describe. ``sign`` is +1 for inserts, -1 for deletes.
+
+async def apply_maintenance(db, deltas: dict):
+    """Apply ``{(equipment_name, maintenance_type): count_delta}`` to the summary."""
+    values = [
+        {"equipment_name": equipment, "maintenance_type": mtype, "job_count": count}
+        for (equipment, mtype), count in deltas.items() if count
+    ]
+    if not values:
+        return
+    await db.execute(_upsert(db, MaintenanceSummary, ["equipment_name", "maintenance_type"], values))
+    await db.execute(delete(MaintenanceSummary).where(MaintenanceSummary.job_count <= 0))
+
+
+async def apply_spend(db, deltas: dict):
+    """Apply ``{(site_hospital, month): [count, mission_fee, transport_fee, total_cost]}``."""
+    values = [
+        {"site_hospital": site, "month": month, "order_count": d[0],
+         "mission_fee": d[1], "transport_fee": d[2], "total_cost": d[3]}
+        for (site, month), d in deltas.items() if d[0]
+    ]
+    if not values:
+        return
+    await db.execute(_upsert(db, MissionSpendSummary, ["site_hospital", "month"], values))
+    await db.execute(delete(MissionSpendSummary).where(MissionSpendSummary.order_count <= 0))
+
+
+async def record_jobcards(db, rows, sign: int = 1):
+    """Count job cards (model objects or column dicts) into the maintenance summary."""
+    deltas = defaultdict(int)
+    for row in rows:
+        deltas[(_get(row, "equipment_name") or "", _get(row, "maintenance_type") or "")] += sign
+    await apply_maintenance(db, deltas)
+
+
+async def record_serviceorders(db, rows, sign: int = 1):
+    """Add service orders (model objects or column dicts) into the spend summary."""
+    deltas = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    for row in rows:
+        d = deltas[(_get(row, "site_hospital") or "", _month(_get(row, "arrival_date")))]
+        d[0] += sign
+        for i, name in enumerate(SPEND_FIELDS, start=1):
+            d[i] += sign * (_get(row, name) or 0)
+    await apply_spend(db, deltas)
+
+
+RECORDERS = {
+    "jobcards": record_jobcards,
+    "serviceorders": record_serviceorders,
+}
+
+
+async def forget_jobcards(db, *criteria):
+    """Subtract the job cards matching ``criteria``, counted in the database; call before deleting them."""
+    result = await db.execute(
+        select(func.coalesce(JobCard.equipment_name, ""), func.coalesce(JobCard.maintenance_type, ""), func.count())
+        .where(*criteria)
+        .group_by(JobCard.equipment_name, JobCard.maintenance_type)
+    )
+    maintenance = defaultdict(int)
+    for equipment, mtype, count in result:
+        maintenance[(equipment, mtype)] -= count
+    await apply_maintenance(db, maintenance)
+
+
+async def forget_serviceorders(db, *criteria):
+    """Subtract the service orders matching ``criteria``; call before deleting them."""
+    month = _month_expr(db.get_bind().dialect.name, ServiceOrder.arrival_date)
+    result = await db.execute(
+        select(
+            func.coalesce(ServiceOrder.site_hospital, ""), func.coalesce(month, ""), func.count(),
+            *(func.coalesce(func.sum(getattr(ServiceOrder, name)), 0) for name in SPEND_FIELDS),
+        )
+        .where(*criteria)
+        .group_by(ServiceOrder.site_hospital, month)
+    )
+    spend = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    for site, month_value, *totals in result:
+        d = spend[(site, month_value)]
+        for i, total in enumerate(totals):
+            d[i] -= total
+    await apply_spend(db, spend)
+
+
+async def forget_user(db, user_id: int):
+    """Subtract all of a user's job cards and service orders; call before deleting them."""
+    await forget_jobcards(db, JobCard.user_id == user_id)
+    await forget_serviceorders(db, ServiceOrder.user_id == user_id)
+
+
+# ---------------------- Full rebuild ---------------------
+async def rebuild(db) -> dict:
+    """Recompute both summaries from the source tables and commit."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        # Writers update the summaries in their own transaction; hold them off
+        # until the recomputed rows are committed.
+        await db.execute(text("LOCK TABLE maintenance_summary, mission_spend_summary IN EXCLUSIVE MODE"))
+
+    await db.execute(delete(MaintenanceSummary))
+    equipment = func.coalesce(JobCard.equipment_name, "")
+    mtype = func.coalesce(JobCard.maintenance_type, "")
+    await db.execute(
+        insert(MaintenanceSummary).from_select(
+            ["equipment_name", "maintenance_type", "job_count"],
+            select(equipment, mtype, func.count()).group_by(equipment, mtype),
+        )
+    )
+
+    await db.execute(delete(MissionSpendSummary))
+    site = func.coalesce(ServiceOrder.site_hospital, "")
+    month = func.coalesce(_month_expr(dialect, ServiceOrder.arrival_date), "")
+    await db.execute(
+        insert(MissionSpendSummary).from_select(
+            ["site_hospital", "month", "order_count", *SPEND_FIELDS],
+            select(
+                site, month, func.count(),
+                *(func.coalesce(func.sum(getattr(ServiceOrder, name)), 0) for name in SPEND_FIELDS),
+            ).group_by(site, month),
+        )
+    )
+    await db.commit()
+    return {
+        "maintenance_rows": await db.scalar(select(func.count()).select_from(MaintenanceSummary)),
+        "spend_rows": await db.scalar(select(func.count()).select_from(MissionSpendSummary)),
+    }
+
+
+# ---------------------- Queries ---------------------
+MAINTENANCE_GROUPS = {
+    "equipment": ("equipment_name",),
+    "type": ("maintenance_type",),
+    "equipment_type": ("equipment_name", "maintenance_type"),
+}
+SPEND_GROUPS = {
+    "site": ("site_hospital",),
+    "month": ("month",),
+    "site_month": ("site_hospital", "month"),
+}
+
+
+async def maintenance_counts(db, group_by: str = "equipment_type", equipment: str = None,
+                             maintenance_type: str = None) -> list:
+    columns = [getattr(MaintenanceSummary, name) for name in MAINTENANCE_GROUPS[group_by]]
+    count = func.sum(MaintenanceSummary.job_count).label("count")
+    stmt = select(*columns, count).group_by(*columns).order_by(count.desc(), *columns)
+    if equipment is not None:
+        stmt = stmt.where(MaintenanceSummary.equipment_name == equipment)
+    if maintenance_type is not None:
+        stmt = stmt.where(MaintenanceSummary.maintenance_type == maintenance_type)
+    return [dict(row._mapping) for row in await db.execute(stmt)]
+
+
+async def mission_spend(db, group_by: str = "site_month", site: str = None,
+                        from_month: str = None, to_month: str = None) -> list:
+    columns = [getattr(MissionSpendSummary, name) for name in SPEND_GROUPS[group_by]]
+    stmt = select(
+        *columns,
+        func.sum(MissionSpendSummary.order_count).label("orders"),
+        *(func.sum(getattr(MissionSpendSummary, name)).label(name) for name in SPEND_FIELDS),
+    ).group_by(*columns).order_by(*columns)
+    if site is not None:
+        stmt = stmt.where(MissionSpendSummary.site_hospital == site)
+    if from_month:
+        stmt = stmt.where(MissionSpendSummary.month >= from_month)
+    if to_month:
+        stmt = stmt.where(MissionSpendSummary.month <= to_month)
+    return [dict(row._mapping) for row in await db.execute(stmt)]
+
+
+async def _main(argv=None):
+    """CLI entry point: ``python -m backend.analytics rebuild``."""
+    from backend.db.database import AsyncSessionLocal, async_engine
+
+    parser = argparse.ArgumentParser(description="Maintain the analytics summary tables.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await rebuild(db)
+    finally:
+        await async_engine.dispose()
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import time
+
+from backend import manual_index
+from backend.ai_assistant import AI_MAX_CONCURRENCY, AIAssistantError, request_completion
+from backend.ai_cache import answer_cache
+
+# Upstream calls in flight per batch; kept below the client-wide limit so one
+# checklist cannot take every slot from interactive /ask users.
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", str(max(1, AI_MAX_CONCURRENCY // 2))))
+ASK_BATCH_MAX_ITEMS = int(os.getenv("ASK_BATCH_MAX_ITEMS", "100"))
+
+
+def parse_batch(body) -> tuple:
+    """Validate a batch request into ``(items, concurrency, ordered)``.
+
+    ``items`` is a list of ``{"instrument", "query"}``; a top-level
+    ``instrument`` applies to items without one. Raises ValueError.
+    """
+    if not isinstance(body, dict) or not isinstance(body.get("items"), list):
+        raise ValueError('Expected a JSON object with an "items" list.')
+    raw_items = body["items"]
+    if not raw_items:
+        raise ValueError("The batch is empty.")
+    if len(raw_items) > ASK_BATCH_MAX_ITEMS:
+        raise ValueError(f"At most {ASK_BATCH_MAX_ITEMS} questions per batch.")
+    default_instrument = body.get("instrument") or None
+    items = []
+    for i, item in enumerate(raw_items):
+        if isinstance(item, str):
+            item = {"query": item}
+        if not isinstance(item, dict) or not isinstance(item.get("query"), str) or not item["query"].strip():
+            raise ValueError(f"Item {i} needs a non-empty \"query\".")
+        instrument = item.get("instrument") or default_instrument
+        if instrument is not None:
+            try:
+                manual_index.check_instrument(instrument)
+            except manual_index.InvalidInstrument:
+                raise ValueError(f"Item {i} has an invalid \"instrument\".")
+        items.append({"instrument": instrument, "query": item["query"]})
+
+    concurrency = body.get("concurrency", ASK_BATCH_CONCURRENCY)
+    if not isinstance(concurrency, int) or concurrency < 1:
+        raise ValueError('"concurrency" must be a positive integer.')
+    # Input order unless the client opts into completion order.
+    return items, min(concurrency, ASK_BATCH_CONCURRENCY), bool(body.get("ordered", True))
+
+
+def retrieve_all(items: list) -> list:
+    """Retrieval for every item, opening each manual (or the global index) once.
+
+    Returns one ``(retrieval, error)`` pair per item. Blocking; run in a thread.
+    """
+    indexes = {}
+    results = []
+    for item in items:
+        instrument = item["instrument"]
+        if instrument not in indexes:
+            indexes[instrument] = manual_index.get_index(instrument) if instrument else manual_index.get_global_index()
+        index = indexes[instrument]
+        if index is None:
+            results.append((None, f"Manual not found for {instrument}." if instrument else "No manuals available."))
+        elif instrument:
+            results.append((index.search(item["query"]), None))
+        else:
+            retrieval = index.route(item["query"])
+            results.append((retrieval, None if retrieval else "No manual matches this question; try naming the instrument."))
+    return results
+
+
+async def _answer(i: int, item: dict, retrieval: dict) -> dict:
+    started = time.perf_counter()
+    key = answer_cache.make_key(retrieval["instrument"], retrieval["content_hash"], item["query"])
+    context = "\n\n".join(retrieval["sections"])
+    result = {"index": i, "instrument": item["instrument"], "query": item["query"]}
+    try:
+        result["response"] = await answer_cache.get_or_fetch(key, lambda: request_completion(item["query"], context))
+        result["sources"] = retrieval["sources"]
+    except AIAssistantError as e:
+        result["error"] = str(e)
+    result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+async def run_batch(items: list, concurrency: int = ASK_BATCH_CONCURRENCY, ordered: bool = True):
+    """Answer ``items`` with at most ``concurrency`` upstream calls at a time.
+
+    Yields one result per item (each carries its ``index``) in input order,
+    or as each completes if not ``ordered``; failures are reported per item.
+    The last value is a summary. Closing the generator cancels the items not
+    yet sent upstream; calls already in flight finish and are cached.
+    """
+    started = time.perf_counter()
+    retrievals = await asyncio.to_thread(retrieve_all, items)
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Queue()
+
+    async def worker(i, item, retrieval):
+        failed = {"index": i, "instrument": item["instrument"], "query": item["query"]}
+        result = {**failed, "error": "The answer was cancelled."}
+        try:
+            async with semaphore:
+                result = await _answer(i, item, retrieval)
+        except asyncio.CancelledError:
+            # Only our own cancellation (the batch is closing) propagates; a
+            # shared fetch cancelled elsewhere fails just this item.
+            if asyncio.current_task().cancelling():
+                raise
+        except Exception as e:
+            result = {**failed, "error": f"Error: {str(e)}"}
+        finally:
+            # Every item must report, or the consumer below waits for it forever.
+            done.put_nowait(result)
+
+    async def fan_out():
+        # Workers only raise when the group itself is cancelled, so one failure
+        # cannot cancel the rest.
+        async with asyncio.TaskGroup() as tg:
+            for i, (item, (retrieval, error)) in enumerate(zip(items, retrievals)):
+                if retrieval is None:
+                    done.put_nowait({"index": i, "instrument": item["instrument"], "query": item["query"],
+                                     "error": error})
+                else:
+                    tg.create_task(worker(i, item, retrieval))
+
+    producer = asyncio.create_task(fan_out())
+    failed = 0
+    waiting = {}  # index -> result held back until its predecessors are out
+    next_index = 0
+    try:
+        for _ in items:
+            result = await done.get()
+            failed += "error" in result
+            if not ordered:
+                yield result
+                continue
+            waiting[result["index"]] = result
+            while next_index in waiting:
+                yield waiting.pop(next_index)
+                next_index += 1
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+    yield {
+        "done": True,
+        "items": len(items),
+        "failed": failed,
+        "concurrency": concurrency,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from sqlalchemy import bindparam, delete, func, select, update
+
+from backend.db.models import Attachment, JobCard
+
+ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", "attachments")
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(25 * 1024 * 1024)))
+ATTACHMENT_CHUNK_SIZE = 1024 * 1024
+
+# JobCard.file_path values that point into the store look like "attachments/<sha256>".
+PATH_PREFIX = "attachments/"
+_SHA_RE = re.compile(r"^[0-9a-f]{64}$")
+
+class AttachmentTooLarge(ValueError):
+    pass
+
+
+def is_valid_sha(sha: str) -> bool:
+    return bool(_SHA_RE.match(sha or ""))
+
+
+def blob_path(sha: str) -> str:
+    return os.path.join(ATTACHMENT_DIR, sha[:2], sha[2:4], sha)
+
+
+def sha_from_path(file_path: str):
+    if file_path and file_path.startswith(PATH_PREFIX):
+        sha = file_path[len(PATH_PREFIX):]
+        if is_valid_sha(sha):
+            return sha
+    return None
+
+
+def _write_chunk(out, digest, chunk: bytes):
+    digest.update(chunk)
+    out.write(chunk)
+
+
+def _install(tmp_path: str, sha: str):
+    path = blob_path(sha)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Always replace and touch: release() only unlinks blobs older than its delete,
+    # so a fresh mtime protects this copy from a concurrent release.
+    os.replace(tmp_path, path)
+    os.utime(path)
+
+
+def _remove_if_stale(sha: str, released_at: float):
+    path = blob_path(sha)
+    try:
+        if os.stat(path).st_mtime < released_at:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _take_reference(db, sha: str, size: int, content_type):
+    """INSERT the blob's row with refcount 1, or add one to an existing row.
+
+    A single upsert, so concurrent first uploads of the same content both succeed.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(Attachment).values(sha256=sha, size=size, content_type=content_type, refcount=1)
+    return stmt.on_conflict_do_update(index_elements=["sha256"], set_={"refcount": Attachment.refcount + 1})
+
+
+async def store_upload(db, upload) -> str:
+    """Stream ``upload`` into the store and take a reference on its blob.
+
+    The upload is read in chunks and hashed while it is written to a temp
+    file, with the blocking work in worker threads. Identical content is stored
+    once. The refcount change joins the caller's transaction, so the caller
+    commits. Returns the ``file_path`` to save on the JobCard.
+    """
+    tmp_dir = os.path.join(ATTACHMENT_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(ATTACHMENT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > ATTACHMENT_MAX_BYTES:
+                    raise AttachmentTooLarge(
+                        f"Attachment exceeds the {ATTACHMENT_MAX_BYTES // (1024 * 1024)} MB limit."
+                    )
+                await asyncio.to_thread(_write_chunk, out, digest, chunk)
+
+        sha = digest.hexdigest()
+        # Take the reference before installing the file (see _install).
+        await db.execute(_take_reference(db, sha, size, upload.content_type))
+        await asyncio.to_thread(_install, tmp_path, sha)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return PATH_PREFIX + sha
+
+
+async def release(db, refs: dict):
+    """Drop references, given as ``{sha: count}``, and commit.
+
+    Blobs whose refcount reaches zero are removed from the table and the disk.
+    """
+    emptied = []
+    released_at = time.time()
+    if refs:
+        # Two statements however many blobs: one executemany UPDATE, one DELETE.
+        table = Attachment.__table__
+        await db.execute(
+            update(table).where(table.c.sha256 == bindparam("sha")).values(refcount=table.c.refcount - bindparam("count")),
+            [{"sha": sha, "count": count} for sha, count in refs.items()],
+        )
+        gone = await db.execute(
+            delete(Attachment).where(Attachment.sha256.in_(list(refs)), Attachment.refcount <= 0)
+            .returning(Attachment.sha256)
+        )
+        emptied = gone.scalars().all()
+    await db.commit()
+
+    for sha in emptied:
+        # Re-check: another upload may have re-created the blob since the commit.
+        if await db.scalar(select(Attachment.sha256).where(Attachment.sha256 == sha)) is None:
+            await asyncio.to_thread(_remove_if_stale, sha, released_at)
+    return emptied
+
+
+def count_refs(file_paths) -> dict:
+    refs = {}
+    for file_path in file_paths:
+        sha = sha_from_path(file_path)
+        if sha:
+            refs[sha] = refs.get(sha, 0) + 1
+    return refs
+
+
+async def refs_for_jobcards(db, *criteria) -> dict:
+    """Like ``count_refs`` for the job cards matching ``criteria``, counted by the database."""
+    result = await db.execute(
+        select(JobCard.file_path, func.count())
+        .where(JobCard.file_path.like(PATH_PREFIX + "%"), *criteria)
+        .group_by(JobCard.file_path)
+    )
+    refs = {}
+    for file_path, count in result:
+        sha = sha_from_path(file_path)
+        if sha:
+            refs[sha] = refs.get(sha, 0) + count
+    return refs
@@ -0,0 +1,64 @@
+import os
+from datetime import date, datetime
+
+from sqlalchemy import DateTime, delete
+
+from backend import attachments
+from backend.analytics import forget_jobcards, forget_serviceorders
+from backend.db.models import JobCard, ServiceOrder
+from backend.page_cache import bump_data_version
+
+BULK_DELETE_MAX_IDS = int(os.getenv("BULK_DELETE_MAX_IDS", "10000"))
+
+# kind -> (model, column "before" applies to, summary updater)
+DELETERS = {
+    "jobcards": (JobCard, JobCard.date_of_service, forget_jobcards),
+    "serviceorders": (ServiceOrder, ServiceOrder.arrival_date, forget_serviceorders),
+}
+
+
+def parse_criteria(kind: str, body) -> list:
+    """Validate a bulk delete request into WHERE criteria.
+
+    ``ids`` selects rows by id and ``before`` (YYYY-MM-DD) rows dated earlier;
+    given both, a row must match both. Raises ValueError.
+    """
+    model, date_column, _ = DELETERS[kind]
+    if not isinstance(body, dict) or ("ids" not in body and "before" not in body):
+        raise ValueError('Expected a JSON object with "ids" and/or "before".')
+    criteria = []
+    if "ids" in body:
+        ids = body["ids"]
+        if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+            raise ValueError('"ids" must be a list of integers.')
+        if len(ids) > BULK_DELETE_MAX_IDS:
+            raise ValueError(f"At most {BULK_DELETE_MAX_IDS} ids per request.")
+        criteria.append(model.id.in_(ids))
+    if "before" in body:
+        try:
+            before = date.fromisoformat(body["before"])
+        except (TypeError, ValueError):
+            raise ValueError('"before" must be formatted as YYYY-MM-DD.')
+        if isinstance(date_column.type, DateTime):
+            before = datetime.combine(before, datetime.min.time())
+        criteria.append(date_column < before)
+    return criteria
+
+
+async def delete_records(db, kind: str, user_id: int, criteria: list) -> int:
+    """Delete the user's rows matching ``criteria`` and commit; returns how many.
+
+    The rows themselves are never loaded: summaries and attachment references
+    are adjusted from aggregates, then one DELETE removes them.
+    """
+    model, _, forget = DELETERS[kind]
+    criteria = [model.user_id == user_id, *criteria]
+    refs = await attachments.refs_for_jobcards(db, *criteria) if model is JobCard else {}
+    await forget(db, *criteria)
+    result = await db.execute(delete(model).where(*criteria).execution_options(synchronize_session=False))
+    if not result.rowcount:
+        await db.rollback()
+        return 0
+    await bump_data_version(db, user_id)
+    await attachments.release(db, refs)  # commits
+    return result.rowcount
@@ -0,0 +1,237 @@
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+
+from backend.analytics import RECORDERS
+from backend.page_cache import bump_data_version
+from backend.db.models import JobCard, ServiceOrder
+from backend.jobcard_handler import parse_jobcard
+from backend.serviceorder_handler import parse_serviceorder
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_BATCH_SIZE = 10000
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+IMPORT_USE_COPY = os.getenv("IMPORT_USE_COPY", "1") == "1"
+
+IMPORTERS = {
+    "jobcards": (JobCard, parse_jobcard),
+    "serviceorders": (ServiceOrder, parse_serviceorder),
+}
+FORMATS = ("csv", "ndjson")
+
+
+def detect_format(filename: str, fmt: str = None) -> str:
+    if fmt:
+        fmt = fmt.lower()
+    else:
+        ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+        fmt = {"jsonl": "ndjson", "json": "ndjson"}.get(ext, ext)
+    if fmt not in FORMATS:
+        raise ValueError("Upload must be CSV or NDJSON.")
+    return fmt
+
+
+class RecordReader:
+    """Reads raw records from a binary file object one batch at a time.
+
+    Each record is ``(row_number, dict_or_error)``; row numbers count data rows
+    from 1. Blocking, so callers run ``next_batch`` in a worker thread.
+    """
+
+    def __init__(self, fileobj, fmt: str):
+        self.text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+        self.fmt = fmt
+        self.row = 0
+        self.done = False
+        self._csv = csv.DictReader(self.text) if fmt == "csv" else None
+
+    def _next_record(self):
+        if self._csv is not None:
+            return next(self._csv)
+        while True:
+            line = next(self.text)
+            if line.strip():
+                break
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            return ValueError(f"invalid JSON: {e}")
+        if not isinstance(record, dict):
+            return ValueError("each line must be a JSON object")
+        return {k: (v if v is None else str(v)) for k, v in record.items()}
+
+    def next_batch(self, size: int) -> list:
+        batch = []
+        while len(batch) < size and not self.done:
+            try:
+                record = self._next_record()
+            except StopIteration:
+                self.done = True
+                break
+            except UnicodeDecodeError as e:
+                # The decoder cannot resynchronise; stop reading the file here.
+                self.done = True
+                self.row += 1
+                batch.append((self.row, ValueError(f"file is not valid UTF-8: {e}")))
+                break
+            except csv.Error as e:
+                self.row += 1
+                batch.append((self.row, ValueError(str(e))))
+                continue
+            self.row += 1
+            batch.append((self.row, record))
+        return batch
+
+    def detach(self):
+        # Leave the underlying upload open for its owner to close.
+        self.text.detach()
+
+
+async def _copy_batch(db, model, rows: list):
+    """COPY ``rows`` over the session's asyncpg connection, in its transaction.
+
+    Driver errors are raised as DBAPIError, like those from any other statement.
+    """
+    import asyncpg
+
+    columns = list(rows[0])
+    conn = await db.connection()
+    # The asyncpg adapter only opens its transaction on the first statement; without
+    # one the COPY would autocommit and survive a rollback of the batch.
+    await conn.exec_driver_sql("SELECT 1")
+    raw = await conn.get_raw_connection()
+    try:
+        await raw.driver_connection.copy_records_to_table(
+            model.__tablename__,
+            records=[tuple(row[c] for c in columns) for row in rows],
+            columns=columns,
+        )
+    except (asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+        raise DBAPIError(f"COPY {model.__tablename__}", None, e) from e
+
+
+async def _insert_batch(db, model, rows: list) -> str:
+    if db.get_bind().dialect.name == "postgresql" and IMPORT_USE_COPY:
+        await _copy_batch(db, model, rows)
+        return "copy"
+    # executemany: one prepared INSERT for the whole batch.
+    await db.execute(insert(model), rows)
+    return "executemany"
+
+
+async def import_records(db, kind: str, fileobj, fmt: str, user_id: int,
+                         batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Validate and insert records from ``fileobj`` in batches, committing each batch.
+
+    Invalid rows are skipped and reported; a batch the database rejects is
+    rolled back and reported as a whole.
+    """
+    model, parse = IMPORTERS[kind]
+    batch_size = max(1, min(int(batch_size), IMPORT_MAX_BATCH_SIZE))
+    reader = RecordReader(fileobj, fmt)
+    errors = []
+    failed = inserted = batches = 0
+    method = None
+    started = time.perf_counter()
+
+    def report(row, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_MAX_ERRORS:
+            errors.append({"row": row, "error": message})
+
+    try:
+        while True:
+            records = await asyncio.to_thread(reader.next_batch, batch_size)
+            if not records:
+                break
+
+            rows = []
+            row_numbers = []
+            for row_no, record in records:
+                if isinstance(record, Exception):
+                    report(row_no, str(record))
+                    continue
+                try:
+                    values = parse(record)
+                except (ValueError, TypeError, AttributeError) as e:
+                    report(row_no, str(e))
+                    continue
+                values["user_id"] = user_id
+                rows.append(values)
+                row_numbers.append(row_no)
+
+            if not rows:
+                continue
+            try:
+                method = await _insert_batch(db, model, rows)
+                await RECORDERS[kind](db, rows)
+                await bump_data_version(db, user_id)
+                await db.commit()
+            except (SQLAlchemyError, OSError) as e:
+                await db.rollback()
+                message = f"batch rejected by database: {e.__class__.__name__}: {str(e).splitlines()[0]}"
+                for row_no in row_numbers:
+                    report(row_no, message)
+                continue
+            inserted += len(rows)
+            batches += 1
+    finally:
+        reader.detach()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "kind": kind,
+        "inserted": inserted,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+        "batches": batches,
+        "batch_size": batch_size,
+        "method": method,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(inserted / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+async def _main(argv=None):
+    """CLI entry point: ``python -m backend.bulk_import jobcards cards.csv --user-id 3``.
+
+    Run it with the servers' REPORT_CACHE_DIR, so they stop serving cached PDF
+    reports that predate the import.
+    """
+    from backend.db.database import AsyncSessionLocal, async_engine
+    from backend.report_cache import report_cache
+
+    parser = argparse.ArgumentParser(description="Bulk import job cards or service orders.")
+    parser.add_argument("kind", choices=sorted(IMPORTERS))
+    parser.add_argument("path", help="CSV or NDJSON file")
+    parser.add_argument("--user-id", type=int, required=True, help="owner of the imported rows")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = detect_format(args.path, args.format)
+    try:
+        with open(args.path, "rb") as f:
+            async with AsyncSessionLocal() as db:
+                result = await import_records(db, args.kind, f, fmt, args.user_id, args.batch_size)
+    finally:
+        await async_engine.dispose()
+    if result["inserted"]:
+        report_cache.mark_stale(args.kind)
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
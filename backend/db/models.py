@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Date, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Date, Float, Index
 from datetime import datetime
 from .database import Base
 from sqlalchemy.orm import relationship
@@ -6,19 +6,29 @@ from sqlalchemy.orm import relationship
 # ---------------- User Model ----------------
 class User(Base):
     __tablename__ = "users"
-    __table_args__ = {'extend_existing': True}  # 👈 Optional safety for hot reloads
+    __table_args__ = (
+        Index("ix_users_listing", "id", "email", "role"),  # covers the admin listing
+        {'extend_existing': True},  # 👈 Optional safety for hot reloads
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
     password = Column(String, nullable=False)
     role = Column(String, nullable=False)
+    # Bumped whenever the user's job cards or service orders change; keys page caches.
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
 
-    jobcards = relationship("JobCard", back_populates="user", cascade="all, delete-orphan")
-    serviceorders = relationship("ServiceOrder", back_populates="user", cascade="all, delete-orphan")
+    # The database deletes a user's rows (ON DELETE CASCADE); the ORM does not load them first.
+    jobcards = relationship("JobCard", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    serviceorders = relationship("ServiceOrder", back_populates="user", cascade="all, delete-orphan",
+                                 passive_deletes=True)
 
 # ---------------- JobCard Model ----------------
 class JobCard(Base):
     __tablename__ = "jobcards"
+    __table_args__ = (
+        Index("ix_jobcards_user_date_id", "user_id", "date_of_service", "id"),  # keyset pagination
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     engineer_name = Column(String)  # ✅ New field
@@ -28,13 +38,16 @@ class JobCard(Base):
     job_description = Column(Text)  # ✅ New field
     spare_parts_used = Column(Text)
     file_path = Column(String)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
 
     user = relationship("User", back_populates="jobcards")
 
 # ---------------- ServiceOrder Model ----------------
 class ServiceOrder(Base):
     __tablename__ = "serviceorders"
+    __table_args__ = (
+        Index("ix_serviceorders_user_arrival_id", "user_id", "arrival_date", "id"),  # keyset pagination
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     engineer_name = Column(String, nullable=False)
@@ -47,7 +60,43 @@ class ServiceOrder(Base):
     transport_fee = Column(Float)
     total_cost = Column(Float)
 
-    user_id = Column(Integer, ForeignKey("users.id"))  # ✅ FK to users table
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))  # ✅ FK to users table
     user = relationship("User", back_populates="serviceorders")
 
+# ---------------- Attachment Model ----------------
+class Attachment(Base):
+    __tablename__ = "attachments"
 
+    sha256 = Column(String(64), primary_key=True)  # content address of the stored blob
+    size = Column(Integer, nullable=False)
+    content_type = Column(String)
+    refcount = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# ---------------- Analytics Summary Models ----------------
+# Maintained incrementally by backend.analytics; NULL names are stored as "".
+class MaintenanceSummary(Base):
+    __tablename__ = "maintenance_summary"
+
+    equipment_name = Column(String, primary_key=True)
+    maintenance_type = Column(String, primary_key=True)
+    job_count = Column(Integer, nullable=False, default=0)
+
+class MissionSpendSummary(Base):
+    __tablename__ = "mission_spend_summary"
+
+    site_hospital = Column(String, primary_key=True)
+    month = Column(String(7), primary_key=True)  # "YYYY-MM" of arrival_date
+    order_count = Column(Integer, nullable=False, default=0)
+    mission_fee = Column(Float, nullable=False, default=0)
+    transport_fee = Column(Float, nullable=False, default=0)
+    total_cost = Column(Float, nullable=False, default=0)
+
+# ---------------- Session Model ----------------
+# Server-side session store used when SESSION_BACKEND=db (see backend.sessions).
+class SessionRecord(Base):
+    __tablename__ = "sessions"
+
+    id = Column(String(64), primary_key=True)
+    data = Column(Text, nullable=False)  # JSON
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,149 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import tempfile
+import zlib
+from datetime import date, datetime
+
+from sqlalchemy import Date, DateTime, Float, Integer
+
+from backend.db.database import AsyncSessionLocal
+from backend.reports import REPORTS, build_query, iter_file
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_SPOOL_BYTES = int(os.getenv("EXPORT_SPOOL_BYTES", str(8 * 1024 * 1024)))
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+def _columns(kind: str):
+    return list(REPORTS[kind].model.__table__.columns)
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+async def _batches(kind: str, filters: dict):
+    # Own session: the response body is produced after the route has returned.
+    # With yield_per the rows come through a server-side cursor (asyncpg),
+    # so memory stays flat regardless of table size.
+    async with AsyncSessionLocal() as db:
+        stmt = build_query(kind, filters).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        result = await db.stream(stmt)
+        async for batch in result.partitions():
+            yield batch
+
+
+async def stream_csv(kind: str, filters: dict):
+    names = [c.key for c in _columns(kind)]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    async for batch in _batches(kind, filters):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def stream_ndjson(kind: str, filters: dict):
+    names = [c.key for c in _columns(kind)]
+    async for batch in _batches(kind, filters):
+        lines = [json.dumps(dict(zip(names, row)), default=_json_default) for row in batch]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _arrow_schema(pa, columns):
+    fields = []
+    for column in columns:
+        if isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(column.type, Date):
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.key, arrow_type))
+    return pa.schema(fields)
+
+
+async def stream_parquet(kind: str, filters: dict):
+    """Write one Parquet row group per batch, then stream the finished file.
+
+    Parquet needs its footer before a reader can use the file, so the output is
+    spooled to a private temp file first.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = _columns(kind)
+    schema = _arrow_schema(pa, columns)
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+    try:
+        writer = pq.ParquetWriter(spool, schema, compression="snappy")
+        async for batch in _batches(kind, filters):
+            table = pa.Table.from_pylist([dict(zip(schema.names, row)) for row in batch], schema=schema)
+            await asyncio.to_thread(writer.write_table, table)
+        await asyncio.to_thread(writer.close)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    async for chunk in iter_file(spool):
+        yield chunk
+
+
+async def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def wants_gzip(accept_encoding: str) -> bool:
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() == "gzip":
+            return params.replace(" ", "") != "q=0"
+    return False
+
+
+STREAMERS = {
+    "csv": stream_csv,
+    "ndjson": stream_ndjson,
+    "parquet": stream_parquet,
+}
+
+
+def check_available(fmt: str):
+    """Raise ExportUnavailable before any response headers are sent."""
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ExportUnavailable("Parquet export requires the 'pyarrow' package.") from e
+
+
+def export_stream(kind: str, fmt: str, filters: dict, gzip: bool = False):
+    chunks = STREAMERS[fmt](kind, filters)
+    return gzip_stream(chunks) if gzip else chunks
@@ -1,20 +1,32 @@
-import os
-import shutil
 from fastapi import Request, UploadFile
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from backend.db.database import get_db
 from backend.db.models import JobCard
-from fastapi.responses import RedirectResponse
+from backend.analytics import record_jobcards
+from backend.attachments import AttachmentTooLarge, store_upload
+from backend.page_cache import bump_data_version
+from backend.report_cache import report_cache
+from fastapi.responses import JSONResponse, RedirectResponse
 
-async def handle_jobcard(request: Request):
+def parse_jobcard(data) -> dict:
+    """Validate one job card (form fields or an import row) into JobCard column values.
+
+    Raises ValueError if a field is missing or malformed.
+    """
+    date_of_service = (data.get("date_of_service") or "").strip()
+    if not date_of_service:
+        raise ValueError("date_of_service is required")
+    return {
+        "engineer_name": data.get("engineer_name"),
+        "equipment_name": data.get("equipment_name"),
+        "maintenance_type": data.get("maintenance_type"),
+        "date_of_service": datetime.strptime(date_of_service, "%Y-%m-%d"),
+        "job_description": data.get("job_description"),
+        "spare_parts_used": data.get("spare_parts_used"),
+    }
+
+async def handle_jobcard(request: Request, db: AsyncSession):
     form = await request.form()
-    engineer_name = form.get("engineer_name")
-    equipment_name = form.get("equipment_name")
-    maintenance_type = form.get("maintenance_type")
-    date_of_service = form.get("date_of_service")
-    job_description = form.get("job_description")
-    spare_parts_used = form.get("spare_parts_used")
     file: UploadFile = form.get("file")
 
     user = request.session.get("user")
@@ -25,24 +37,25 @@ async def handle_jobcard(request: Request):
     if not user_id:
         return RedirectResponse("/login", status_code=302)
 
+    values = parse_jobcard(form)
+
     file_path = ""
     if file and file.filename:
-        upload_dir = "uploaded_files"
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        try:
+            file_path = await store_upload(db, file)
+        except AttachmentTooLarge as e:
+            await db.rollback()
+            return JSONResponse({"error": str(e)}, status_code=413)
 
-    db: Session = next(get_db())
     jobcard = JobCard(
-        equipment_name=equipment_name,
-        maintenance_type=maintenance_type,
-        date_of_service=datetime.strptime(date_of_service, "%Y-%m-%d"),
-        spare_parts_used=spare_parts_used,
+        **values,
         file_path=file_path,
         user_id=user_id
     )
     db.add(jobcard)
-    db.commit()
+    await record_jobcards(db, [values])
+    await bump_data_version(db, user_id)
+    await db.commit()
+    report_cache.invalidate("jobcards")
 
     return RedirectResponse("/jobcard", status_code=302)
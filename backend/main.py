@@ -1,47 +1,128 @@
-from fastapi import FastAPI, Request, Form, UploadFile, File, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse
+from fastapi import FastAPI, Request, Form, UploadFile, File, Depends, Response
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, FileResponse, StreamingResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from markupsafe import Markup
 from starlette.status import HTTP_302_FOUND
-from starlette.middleware.sessions import SessionMiddleware
 
-import secrets, os, io, shutil
+import os, shutil
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from passlib.context import CryptContext
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
 
-from backend.db.database import SessionLocal, get_db, Base, engine
+from backend.db.database import get_db, Base, engine, async_engine, pool_stats, DB_CREATE_ALL
 from backend.db.models import User, JobCard, ServiceOrder
-from backend.ai_assistant import ask_ai
+from backend import security
+from backend.security import hash_password, verify_password
+from backend.ai_assistant import AIAssistantError, llm_client, stream_completion
+from backend.ai_cache import answer_cache, ask_ai_cached
+from backend import analytics, ask_batch, attachments, manual_index, manual_ingest, metrics, page_cache, search
+from backend.sessions import SessionMiddleware, session_backend
+from backend.reports import REPORTS, iter_file, parse_filters
+from backend.report_cache import report_cache
+from backend.bulk_import import IMPORT_BATCH_SIZE, IMPORTERS, detect_format, import_records
+from backend.bulk_delete import DELETERS, delete_records, parse_criteria
+from backend.exports import MEDIA_TYPES, ExportUnavailable, check_available, export_stream, wants_gzip
+from backend.pagination import PAGE_SIZE_DEFAULT, InvalidCursor, keyset_page, to_dict
 from backend.jobcard_handler import handle_jobcard
 from backend.serviceorder_handler import handle_serviceorder
 
 import backend.db.models  # Ensure models are registered
 
-# ---------------------- App Setup ---------------------
-app = FastAPI(debug=True)
-app.add_middleware(SessionMiddleware, secret_key=secrets.token_hex(32))
+logger = logging.getLogger(__name__)
 
-templates = Jinja2Templates(directory="backend/templates")
+# ---------------------- App Setup ---------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Importing this module has no side effects; everything that touches the
+    # database or the filesystem happens here, as does creating the pooled AI client.
+    if DB_CREATE_ALL:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    report_cache.start()
+    session_backend.start()
+    await llm_client.start()
+    try:
+        yield
+    finally:
+        await llm_client.aclose()
+        report_cache.close()
+        await session_backend.close()
+        await manual_ingest.ingest_queue.close()
+        security.shutdown()
+        await async_engine.dispose()
+
+app = FastAPI(debug=True, lifespan=lifespan)
+app.add_middleware(SessionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+metrics.instrument_engine(async_engine.sync_engine)
+
+templates = Jinja2Templates(env=page_cache.template_environment())
 app.mount("/static", StaticFiles(directory="backend/static"), name="static")
 
-os.makedirs("uploaded_files", exist_ok=True)
-app.mount("/uploaded_files", StaticFiles(directory="uploaded_files"), name="uploaded_files")
+# Pages are revalidated on every visit; an unchanged page is answered with a 304.
+PAGE_CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Cookie"}
+
+def static_page(request: Request, name: str, user=None):
+    """Render a template that depends only on itself and ``user``, honouring If-None-Match."""
+    etag = page_cache.make_etag(name, page_cache.template_tag(name), user)
+    headers = {"ETag": etag, **PAGE_CACHE_HEADERS}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return templates.TemplateResponse(name, {"request": request, "user": user}, headers=headers)
 
-# ---------------------- Password Hashing ---------------------
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def can_view_stats(request: Request) -> bool:
+    """Pool, cache and traffic internals are for staff, or a scraper holding METRICS_TOKEN."""
+    user = request.session.get("user")
+    return bool(user and user["role"] == "staff") or metrics.has_token(request)
+
+async def list_page(request: Request, db: AsyncSession, name: str, rows_name: str, user_id,
+                    cursor: str, limit: int, list_rows):
+    """Render a list page whose table is cached per user, data version and page.
+
+    The version is read before the rows, so a cached table is never older than
+    the version it is filed under.
+    """
+    version = await page_cache.data_version(db, user_id)
+    tag = page_cache.template_tag(f"{name}.html", f"_{name}_table.html")
+    key = (name, tag, user_id, version, cursor, limit)
+    headers = {}
+    if version is not None:
+        headers = {"ETag": page_cache.make_etag(*key), **PAGE_CACHE_HEADERS}
+        if etag_matches(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+    async def render_table():
+        rows, next_cursor = await list_rows(db, user_id, cursor, limit)
+        return templates.get_template(f"_{name}_table.html").render(
+            {rows_name: rows, "cursor": cursor, "next_cursor": next_cursor, "limit": limit}
+        )
+
+    try:
+        if version is None:
+            # Not logged in: nothing to key the cache on.
+            table = await render_table()
+        else:
+            table = await page_cache.fragment_cache.get_or_render(key, render_table)
+    except InvalidCursor:
+        return RedirectResponse(f"/{name}", status_code=302)
+    return templates.TemplateResponse(f"{name}.html", {"request": request, "table": Markup(table)}, headers=headers)
 
 # ---------------------- Home ---------------------
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return static_page(request, "index.html")
 
 @app.get("/login", response_class=HTMLResponse)
 async def login_get(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return static_page(request, "index.html")
 
 # ---------------------- LOGIN ---------------------
 @app.post("/login")
@@ -49,15 +130,20 @@ async def login(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
 
-    if not user or not pwd_context.verify(password, user.password):
+    valid, new_hash = await verify_password(password, user.password) if user else (False, None)
+    if not valid:
         return templates.TemplateResponse("index.html", {
             "request": request,
             "error": "Invalid email or password."
         })
+    if new_hash:
+        # Stored hash used an old bcrypt cost; upgrade it transparently.
+        user.password = new_hash
+        await db.commit()
 
     request.session["user"] = {
         "email": user.email,
@@ -92,19 +178,19 @@ async def register_user(
     email: str = Form(...),
     password: str = Form(...),
     role: str = Form(...),
+    db: AsyncSession = Depends(get_db)
 ):
-    db = next(get_db())
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = await db.scalar(select(User).where(User.email == email))
     if existing_user:
         return templates.TemplateResponse("register.html", {
             "request": request,
             "error": "Email already registered."
         })
 
-    hashed_password = pwd_context.hash(password)
+    hashed_password = await hash_password(password)
     new_user = User(email=email, password=hashed_password, role=role)
     db.add(new_user)
-    db.commit()
+    await db.commit()
     return RedirectResponse("/", status_code=HTTP_302_FOUND)
 
 # ---------------------- DASHBOARDS ---------------------
@@ -113,31 +199,113 @@ async def client_dashboard(request: Request):
     user = request.session.get("user")
     if not user or user["role"] != "client":
         return RedirectResponse("/", status_code=HTTP_302_FOUND)
-    return templates.TemplateResponse("client.html", {"request": request, "user": user})
+    return static_page(request, "client.html", user)
 
 @app.get("/pharmalab", response_class=HTMLResponse)
 async def staff_dashboard(request: Request):
     user = request.session.get("user")
     if not user or user["role"] != "staff":
         return RedirectResponse("/", status_code=HTTP_302_FOUND)
-    return templates.TemplateResponse("pharmalab.html", {"request": request, "user": user})
+    return static_page(request, "pharmalab.html", user)
 
 # ---------------------- ADMIN USERS ---------------------
+def _counts_by_user(model, user_ids):
+    return (
+        select(model.user_id, func.count().label("count"))
+        .where(model.user_id.in_(user_ids))
+        .group_by(model.user_id)
+        .subquery()
+    )
+
+async def activity_counts(db: AsyncSession, user_ids: list) -> dict:
+    """``{user_id: (job cards, service orders)}`` from one grouped LEFT JOIN query.
+
+    Each count is an index-only scan of the (user_id, ...) listing index,
+    limited to ``user_ids``.
+    """
+    if not user_ids:
+        return {}
+    jobcards = _counts_by_user(JobCard, user_ids)
+    serviceorders = _counts_by_user(ServiceOrder, user_ids)
+    result = await db.execute(
+        select(User.id, func.coalesce(jobcards.c.count, 0), func.coalesce(serviceorders.c.count, 0))
+        .outerjoin(jobcards, jobcards.c.user_id == User.id)
+        .outerjoin(serviceorders, serviceorders.c.user_id == User.id)
+        .where(User.id.in_(user_ids))
+    )
+    return {user_id: (jobcard_count, serviceorder_count) for user_id, jobcard_count, serviceorder_count in result}
+
+async def list_users(db: AsyncSession, cursor: str = None, limit: int = PAGE_SIZE_DEFAULT):
+    """One page of users with their activity counts: two queries whatever the page size."""
+    # Only the listed columns are selected so ix_users_listing can cover the scan.
+    stmt = select(User.id, User.email, User.role)
+    rows, next_cursor = await keyset_page(db, stmt, [User.id], cursor, limit, descending=False, scalars=False)
+    counts = await activity_counts(db, [row.id for row in rows])
+    users = []
+    for row in rows:
+        jobcard_count, serviceorder_count = counts.get(row.id, (0, 0))
+        users.append({**to_dict(row), "jobcard_count": jobcard_count, "serviceorder_count": serviceorder_count})
+    return users, next_cursor
+
 @app.get("/admin/users", response_class=HTMLResponse)
-async def admin_users(request: Request):
-    db = next(get_db())
-    users = db.query(User).all()
-    return templates.TemplateResponse("admin_users.html", {"request": request, "users": users})
+async def admin_users(request: Request, cursor: str = None, limit: int = PAGE_SIZE_DEFAULT,
+                      db: AsyncSession = Depends(get_db)):
+    try:
+        users, next_cursor = await list_users(db, cursor, limit)
+    except InvalidCursor:
+        return RedirectResponse("/admin/users", status_code=HTTP_302_FOUND)
+    return templates.TemplateResponse("admin_users.html", {
+        "request": request, "users": users, "cursor": cursor, "next_cursor": next_cursor, "limit": limit
+    })
+
+@app.get("/api/admin/users")
+async def api_admin_users(request: Request, cursor: str = None, limit: int = PAGE_SIZE_DEFAULT,
+                          db: AsyncSession = Depends(get_db)):
+    user = request.session.get("user")
+    if not user or user["role"] != "staff":
+        return JSONResponse({"error": "Not authorized."}, status_code=403)
+    try:
+        users, next_cursor = await list_users(db, cursor, limit)
+    except InvalidCursor as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"items": users, "next_cursor": next_cursor})
 
 @app.post("/admin/users/delete/{user_id}")
-async def delete_user(user_id: int):
-    db = next(get_db())
-    user = db.query(User).filter(User.id == user_id).first()
-    if user:
-        db.delete(user)
-        db.commit()
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
+    # Aggregates only: nothing here loads the user's job cards or service orders.
+    refs = await attachments.refs_for_jobcards(db, JobCard.user_id == user_id)
+    await analytics.forget_user(db, user_id)
+    result = await db.execute(delete(User).where(User.id == user_id))  # ON DELETE CASCADE removes the rest
+    if result.rowcount:
+        await attachments.release(db, refs)  # commits
+        report_cache.invalidate("jobcards")
+        report_cache.invalidate("serviceorders")
+    else:
+        await db.rollback()
     return RedirectResponse("/admin/users", status_code=HTTP_302_FOUND)
 
+@app.get("/admin/db-pool")
+async def admin_db_pool(request: Request):
+    if not can_view_stats(request):
+        return JSONResponse({"error": "Not authorized."}, status_code=403)
+    return JSONResponse(pool_stats.snapshot())
+
+# ---------------------- METRICS ---------------------
+@app.get("/metrics")
+async def prometheus_metrics(request: Request):
+    if not can_view_stats(request):
+        return JSONResponse({"error": "Not authorized."}, status_code=403)
+    extra = (
+        metrics.gauges("db_pool", "Database connection pool", pool_stats.snapshot())
+        + metrics.gauges("llm_client", "AI assistant upstream client", llm_client.stats())
+        + metrics.gauges("report_cache", "Rendered PDF report cache", report_cache.stats())
+        + metrics.gauges("answer_cache", "AI answer cache", answer_cache.stats())
+        + metrics.gauges("session_cache", "Server-side session cache", session_backend.stats())
+        + metrics.gauges("fragment_cache", "Rendered list table cache", page_cache.fragment_cache.stats())
+        + metrics.gauges("manual_ingest", "Manual ingestion queue", manual_ingest.ingest_queue.stats())
+    )
+    return PlainTextResponse(metrics.render(extra), media_type="text/plain; version=0.0.4")
+
 # ---------------------- MANUAL UPLOAD ---------------------
 @app.get("/upload-manual", response_class=HTMLResponse)
 async def upload_manual_form(request: Request):
@@ -153,139 +321,423 @@ async def upload_manual(request: Request, instrument: str = Form(...), manual: U
         return RedirectResponse("/", status_code=HTTP_302_FOUND)
 
     try:
-        manual_dir = "manuals"
-        os.makedirs(manual_dir, exist_ok=True)
-        file_path = os.path.join(manual_dir, f"{instrument}.txt")
-        with open(file_path, "wb") as f:
-            f.write(await manual.read())
-
-        return templates.TemplateResponse("upload_manual.html", {
-            "request": request,
-            "success": f"Manual for '{instrument}' uploaded successfully."
-        })
+        uploaded = await manual_ingest.receive(instrument, manual)
+        summary = await manual_ingest.process(uploaded)
+    except manual_ingest.ManualRejected as e:
+        return templates.TemplateResponse("upload_manual.html", {"request": request, "error": str(e)},
+                                          status_code=400)
     except Exception as e:
         return templates.TemplateResponse("upload_manual.html", {
             "request": request,
             "error": f"Upload failed: {str(e)}"
         })
 
+    if summary is None:
+        message = f"Manual for '{instrument}' received; it is being processed in the background."
+    else:
+        message = f"Manual for '{instrument}' uploaded successfully ({summary['sections']} sections)."
+    return templates.TemplateResponse("upload_manual.html", {"request": request, "success": message})
+
+@app.get("/manuals/{instrument}/status")
+async def manual_status(request: Request, instrument: str):
+    user = request.session.get("user")
+    if not user or user["role"] != "staff":
+        return JSONResponse({"error": "Not authorized."}, status_code=403)
+    status = manual_ingest.read_status(instrument)
+    if status is None:
+        return JSONResponse({"error": "Manual not found."}, status_code=404)
+    return JSONResponse(status)
+
 # ---------------------- JOB CARD ---------------------
+async def list_jobcards(db: AsyncSession, user_id, cursor: str = None, limit: int = PAGE_SIZE_DEFAULT):
+    # Newest first; walks ix_jobcards_user_date_id backwards.
+    stmt = select(JobCard).where(JobCard.user_id == user_id)
+    return await keyset_page(db, stmt, [JobCard.date_of_service, JobCard.id], cursor, limit)
+
 @app.get("/jobcard", response_class=HTMLResponse)
-async def jobcard_form(request: Request):
-    db = next(get_db())
+async def jobcard_form(request: Request, cursor: str = None, limit: int = PAGE_SIZE_DEFAULT,
+                       db: AsyncSession = Depends(get_db)):
     user = request.session.get("user")
     user_id = user["user_id"] if user else None
-    jobcards = db.query(JobCard).filter(JobCard.user_id == user_id).all()
-    return templates.TemplateResponse("jobcard.html", {"request": request, "jobcards": jobcards})
+    return await list_page(request, db, "jobcard", "jobcards", user_id, cursor, limit, list_jobcards)
+
+@app.get("/api/jobcards")
+async def api_jobcards(request: Request, cursor: str = None, limit: int = PAGE_SIZE_DEFAULT,
+                       db: AsyncSession = Depends(get_db)):
+    user = request.session.get("user")
+    if not user:
+        return JSONResponse({"error": "Not authenticated."}, status_code=401)
+    try:
+        jobcards, next_cursor = await list_jobcards(db, user["user_id"], cursor, limit)
+    except InvalidCursor as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"items": [to_dict(j) for j in jobcards], "next_cursor": next_cursor})
 
 @app.post("/submit-jobcard")
-async def submit_jobcard(request: Request):
-    return await handle_jobcard(request)
+async def submit_jobcard(request: Request, db: AsyncSession = Depends(get_db)):
+    return await handle_jobcard(request, db)
 
 @app.post("/delete-jobcard/{jobcard_id}")
-async def delete_jobcard(jobcard_id: int):
-    db = next(get_db())
-    jobcard = db.query(JobCard).filter(JobCard.id == jobcard_id).first()
+async def delete_jobcard(jobcard_id: int, db: AsyncSession = Depends(get_db)):
+    jobcard = await db.get(JobCard, jobcard_id)
     if jobcard:
-        db.delete(jobcard)
-        db.commit()
+        await db.delete(jobcard)
+        await analytics.record_jobcards(db, [jobcard], sign=-1)
+        await page_cache.bump_data_version(db, jobcard.user_id)
+        await attachments.release(db, attachments.count_refs([jobcard.file_path]))  # commits
+        report_cache.invalidate("jobcards")
     return RedirectResponse("/jobcard", status_code=302)
 
-@app.get("/download-jobcards", response_class=FileResponse)
-def download_jobcards():
-    db = next(get_db())
-    jobcards = db.query(JobCard).all()
-
-    pdf_path = "jobcards_report.pdf"
-    c = canvas.Canvas(pdf_path, pagesize=letter)
-    y = letter[1] - 50
-    c.setFont("Helvetica", 12)
-    c.drawString(100, y, "BiomedLink - Job Cards Report")
-    y -= 30
-
-    for job in jobcards:
-        if y < 100:
-            c.showPage()
-            y = letter[1] - 50
-        c.drawString(50, y, f"ID: {job.id}")
-        c.drawString(120, y, f"Equipment: {job.equipment_name}")
-        y -= 20
-        c.drawString(120, y, f"Type: {job.maintenance_type}, Date: {job.date_of_service.strftime('%Y-%m-%d')}")
-        y -= 20
-        c.drawString(120, y, f"Spare Parts: {job.spare_parts_used or 'None'}")
-        y -= 30
-
-    c.save()
-    return FileResponse(pdf_path, media_type='application/pdf', filename="jobcards_report.pdf")
+@app.get("/download-jobcards")
+async def download_jobcards(request: Request):
+    return await report_response("jobcards", request)
 
 # ---------------------- SERVICE ORDER ---------------------
+async def list_serviceorders(db: AsyncSession, user_id, cursor: str = None, limit: int = PAGE_SIZE_DEFAULT):
+    # Latest missions first; walks ix_serviceorders_user_arrival_id backwards.
+    stmt = select(ServiceOrder).where(ServiceOrder.user_id == user_id)
+    return await keyset_page(db, stmt, [ServiceOrder.arrival_date, ServiceOrder.id], cursor, limit)
+
 @app.get("/serviceorder", response_class=HTMLResponse)
-async def serviceorder_form(request: Request):
-    db = next(get_db())
+async def serviceorder_form(request: Request, cursor: str = None, limit: int = PAGE_SIZE_DEFAULT,
+                            db: AsyncSession = Depends(get_db)):
     user = request.session.get("user")
     user_id = user["user_id"] if user else None
-    serviceorders = db.query(ServiceOrder).filter(ServiceOrder.user_id == user_id).all()
-    return templates.TemplateResponse("serviceorder.html", {"request": request, "serviceorders": serviceorders})
+    return await list_page(request, db, "serviceorder", "serviceorders", user_id, cursor, limit, list_serviceorders)
+
+@app.get("/api/serviceorders")
+async def api_serviceorders(request: Request, cursor: str = None, limit: int = PAGE_SIZE_DEFAULT,
+                            db: AsyncSession = Depends(get_db)):
+    user = request.session.get("user")
+    if not user:
+        return JSONResponse({"error": "Not authenticated."}, status_code=401)
+    try:
+        serviceorders, next_cursor = await list_serviceorders(db, user["user_id"], cursor, limit)
+    except InvalidCursor as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"items": [to_dict(o) for o in serviceorders], "next_cursor": next_cursor})
 
 @app.post("/submit-serviceorder")
-async def submit_serviceorder(request: Request):
-    return await handle_serviceorder(request)
+async def submit_serviceorder(request: Request, db: AsyncSession = Depends(get_db)):
+    return await handle_serviceorder(request, db)
 
 @app.post("/delete-serviceorder/{serviceorder_id}")
-async def delete_serviceorder(serviceorder_id: int):
-    db = next(get_db())
-    serviceorder = db.query(ServiceOrder).filter(ServiceOrder.id == serviceorder_id).first()
+async def delete_serviceorder(serviceorder_id: int, db: AsyncSession = Depends(get_db)):
+    serviceorder = await db.get(ServiceOrder, serviceorder_id)
     if serviceorder:
-        db.delete(serviceorder)
-        db.commit()
+        await db.delete(serviceorder)
+        await analytics.record_serviceorders(db, [serviceorder], sign=-1)
+        await page_cache.bump_data_version(db, serviceorder.user_id)
+        await db.commit()
+        report_cache.invalidate("serviceorders")
     return RedirectResponse("/serviceorder", status_code=302)
 
 @app.get("/download-serviceorders-pdf")
-def download_serviceorders_pdf():
-    db = next(get_db())
-    serviceorders = db.query(ServiceOrder).all()
-
-    buffer = io.BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
-    y = A4[1] - 50
-    pdf.setFont("Helvetica", 12)
-    pdf.drawString(50, y, "Submitted Service Orders")
-    y -= 30
-
-    for order in serviceorders:
-        pdf.drawString(50, y, f"Issue: {order.issue}")
-        pdf.drawString(250, y, f"Spare Parts: {order.spare_parts}")
-        pdf.drawString(450, y, f"Date: {order.date.strftime('%Y-%m-%d')}")
-        y -= 20
-        if y < 50:
-            pdf.showPage()
-            y = A4[1] - 50
-
-    pdf.save()
-    buffer.seek(0)
-    return FileResponse(buffer, media_type="application/pdf", filename="serviceorders.pdf")
+async def download_serviceorders_pdf(request: Request):
+    return await report_response("serviceorders", request)
+
+# ---------------------- REPORTS ---------------------
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+async def report_response(kind: str, request: Request):
+    try:
+        filters = parse_filters(request.query_params)
+    except ValueError:
+        return JSONResponse({"error": "Dates must be formatted as YYYY-MM-DD."}, status_code=400)
+
+    entry = await report_cache.get(kind, filters)
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        fileobj = open(entry.path, "rb")
+    except FileNotFoundError:
+        # Evicted between lookup and open; render it again.
+        entry = await report_cache.get(kind, filters)
+        fileobj = open(entry.path, "rb")
+    return StreamingResponse(iter_file(fileobj), media_type="application/pdf", headers={
+        **headers,
+        "ETag": entry.etag,
+        "Content-Length": str(entry.size),
+        "Content-Disposition": f'attachment; filename="{REPORTS[kind].filename}"',
+        "X-Report-Rows": str(entry.stats["rows"]),
+        "X-Report-Rows-Per-Sec": str(entry.stats["rows_per_sec"]),
+    })
+
+# ---------------------- ATTACHMENTS ---------------------
+@app.get("/attachments/{sha}")
+async def get_attachment(sha: str, request: Request, db: AsyncSession = Depends(get_db)):
+    if not attachments.is_valid_sha(sha):
+        return JSONResponse({"error": "Attachment not found."}, status_code=404)
+    # The URL is the content hash, so the bytes behind it never change.
+    etag = f'"{sha}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    attachment = await db.get(attachments.Attachment, sha)
+    path = attachments.blob_path(sha)
+    if attachment is None or not os.path.exists(path):
+        return JSONResponse({"error": "Attachment not found."}, status_code=404)
+    # FileResponse streams from disk and answers Range requests.
+    return FileResponse(path, media_type=attachment.content_type or "application/octet-stream", headers=headers)
+
+@app.get("/uploaded_files/{name}")
+async def get_legacy_upload(name: str):
+    # Files uploaded before the attachment store; served read-only.
+    path = os.path.join("uploaded_files", os.path.basename(name))
+    if not os.path.isfile(path):
+        return JSONResponse({"error": "File not found."}, status_code=404)
+    return FileResponse(path, headers={"Cache-Control": "private, no-cache"})
+
+# ---------------------- EXPORTS ---------------------
+@app.get("/export/{kind}")
+async def export_data(request: Request, kind: str, format: str = "csv"):
+    user = request.session.get("user")
+    if not user:
+        return JSONResponse({"error": "Not authenticated."}, status_code=401)
+    if kind not in REPORTS or format not in MEDIA_TYPES:
+        return JSONResponse({"error": "Unknown export."}, status_code=404)
+    try:
+        # Like the list pages, an export holds only the user's own rows.
+        filters = {**parse_filters(request.query_params), "user_id": user["user_id"]}
+        check_available(format)
+    except ValueError:
+        return JSONResponse({"error": "Dates must be formatted as YYYY-MM-DD."}, status_code=400)
+    except ExportUnavailable as e:
+        return JSONResponse({"error": str(e)}, status_code=501)
+
+    gzip = wants_gzip(request.headers.get("accept-encoding"))
+    headers = {
+        "Content-Disposition": f'attachment; filename="{kind}.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(export_stream(kind, format, filters, gzip), media_type=MEDIA_TYPES[format], headers=headers)
+
+# ---------------------- BULK IMPORT ---------------------
+@app.post("/import/{kind}")
+async def bulk_import(
+    request: Request,
+    kind: str,
+    file: UploadFile = File(...),
+    format: str = Form(None),
+    batch_size: int = Form(IMPORT_BATCH_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    user = request.session.get("user")
+    if not user:
+        return JSONResponse({"error": "Not authenticated."}, status_code=401)
+    if kind not in IMPORTERS:
+        return JSONResponse({"error": "Unknown import."}, status_code=404)
+    try:
+        fmt = detect_format(file.filename, format)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    result = await import_records(db, kind, file.file, fmt, user["user_id"], batch_size)
+    if result["inserted"]:
+        report_cache.invalidate(kind)
+    return JSONResponse(result)
+
+# ---------------------- BULK DELETE ---------------------
+@app.post("/bulk-delete/{kind}")
+async def bulk_delete(request: Request, kind: str, db: AsyncSession = Depends(get_db)):
+    user = request.session.get("user")
+    if not user:
+        return JSONResponse({"error": "Not authenticated."}, status_code=401)
+    if kind not in DELETERS:
+        return JSONResponse({"error": "Unknown delete."}, status_code=404)
+    try:
+        criteria = parse_criteria(kind, await request.json())
+    except ValueError as e:  # includes malformed JSON
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    deleted = await delete_records(db, kind, user["user_id"], criteria)
+    if deleted:
+        report_cache.invalidate(kind)
+    return JSONResponse({"deleted": deleted})
+
+@app.get("/admin/report-cache")
+async def admin_report_cache(request: Request):
+    if not can_view_stats(request):
+        return JSONResponse({"error": "Not authorized."}, status_code=403)
+    return JSONResponse(report_cache.stats())
+
+# ---------------------- SEARCH ---------------------
+@app.get("/search")
+async def search_records(request: Request, q: str = "", page: int = 1, limit: int = search.SEARCH_PAGE_SIZE_DEFAULT,
+                         db: AsyncSession = Depends(get_db)):
+    user = request.session.get("user")
+    if not user:
+        return JSONResponse({"error": "Not authenticated."}, status_code=401)
+    q = q.strip()
+    if not q:
+        return JSONResponse({"error": "Query is required."}, status_code=400)
+    started = time.perf_counter()
+    result = await search.search(db, user["user_id"], q, page, limit)
+    result["query"] = q
+    result["query_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return JSONResponse(result)
+
+# ---------------------- ANALYTICS ---------------------
+# Served from the summary tables, so cost depends on distinct groups, not history.
+@app.get("/analytics/maintenance")
+async def analytics_maintenance(request: Request, group_by: str = "equipment_type", equipment: str = None,
+                                maintenance_type: str = None, db: AsyncSession = Depends(get_db)):
+    user = request.session.get("user")
+    if not user or user["role"] != "staff":
+        return JSONResponse({"error": "Not authorized."}, status_code=403)
+    if group_by not in analytics.MAINTENANCE_GROUPS:
+        return JSONResponse({"error": f"group_by must be one of {', '.join(analytics.MAINTENANCE_GROUPS)}."}, status_code=400)
+    started = time.perf_counter()
+    items = await analytics.maintenance_counts(db, group_by, equipment, maintenance_type)
+    return JSONResponse({"group_by": group_by, "items": items,
+                         "query_ms": round((time.perf_counter() - started) * 1000, 2)})
+
+@app.get("/analytics/missions")
+async def analytics_missions(request: Request, group_by: str = "site_month", site: str = None,
+                             from_month: str = None, to_month: str = None, db: AsyncSession = Depends(get_db)):
+    user = request.session.get("user")
+    if not user or user["role"] != "staff":
+        return JSONResponse({"error": "Not authorized."}, status_code=403)
+    if group_by not in analytics.SPEND_GROUPS:
+        return JSONResponse({"error": f"group_by must be one of {', '.join(analytics.SPEND_GROUPS)}."}, status_code=400)
+    for value in (from_month, to_month):
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m")
+            except ValueError:
+                return JSONResponse({"error": "Months must be formatted as YYYY-MM."}, status_code=400)
+    started = time.perf_counter()
+    items = await analytics.mission_spend(db, group_by, site, from_month, to_month)
+    return JSONResponse({"group_by": group_by, "items": items,
+                         "query_ms": round((time.perf_counter() - started) * 1000, 2)})
 
 # ---------------------- AI Assistant ---------------------
+async def retrieve_context(query: str, instrument: str = None):
+    """Sections of ``instrument``'s manual, or of the best-matching manuals if none is given.
+
+    Returns ``(retrieval, message)``; ``message`` explains a missing retrieval.
+    Raises InvalidInstrument for a name that cannot be a manual's.
+    """
+    if instrument:
+        manual_index.check_instrument(instrument)  # before the name reaches a file path
+        retrieval = await asyncio.to_thread(manual_index.retrieve, instrument, query)
+        return retrieval, f"Manual not found for {instrument}."
+    retrieval = await asyncio.to_thread(manual_index.route, query)
+    return retrieval, "No manual matches this question; try naming the instrument."
+
 @app.post("/ask")
 async def ask_endpoint(request: Request):
     form = await request.form()
     query = form.get("query")
     instrument = form.get("instrument")
 
-    if not query or not instrument:
-        return JSONResponse({"response": "Query or instrument missing."})
-
-    manual_path = f"manuals/{instrument}.txt"
-    if not os.path.exists(manual_path):
-        return JSONResponse({"response": f"Manual not found for {instrument}."})
+    if not query:
+        return JSONResponse({"response": "Query missing."})
 
     try:
-        with open(manual_path, "r") as f:
-            manual_content = f.read()
-        ai_response = await ask_ai(query, manual_content)
-        return JSONResponse({"response": ai_response})
+        retrieval, message = await retrieve_context(query, instrument)
+        if retrieval is None:
+            return JSONResponse({"response": message})
+
+        context = "\n\n".join(retrieval["sections"])
+        ai_response = await ask_ai_cached(retrieval["instrument"], retrieval["content_hash"], query, context)
+        return JSONResponse({"response": ai_response, "tokens": retrieval["usage"], "sources": retrieval["sources"]})
+    except manual_index.InvalidInstrument as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
     except Exception as e:
         return JSONResponse({"response": f"Error: {str(e)}"})
 
-# ---------------------- DB Init ---------------------
-Base.metadata.create_all(bind=engine)
+def sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_stream_endpoint(request: Request):
+    started = time.perf_counter()
+    form = await request.form()
+    query = form.get("query")
+    instrument = form.get("instrument")
+
+    if not query:
+        return JSONResponse({"response": "Query missing."})
+
+    sse_headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    try:
+        retrieval, message = await retrieve_context(query, instrument)
+    except manual_index.InvalidInstrument as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        # Reported in the stream, as /ask reports it in its JSON body.
+        logger.exception("ask/stream retrieval failed")
+        error = sse_event({"error": f"Error: {str(e)}"}, event="error")
+        return StreamingResponse(iter([error]), media_type="text/event-stream", headers=sse_headers)
+    if retrieval is None:
+        return JSONResponse({"response": message})
+    context = "\n\n".join(retrieval["sections"])
+    key = answer_cache.make_key(retrieval["instrument"], retrieval["content_hash"], query)
+
+    # StreamingResponse only pulls the next event once the previous one has been
+    # sent, so a slow client slows the upstream read; on disconnect the generator
+    # is cancelled and the upstream stream is closed with it.
+    async def events():
+        yield sse_event({"tokens": retrieval["usage"], "sources": retrieval["sources"]}, event="meta")
+        first_token_at = None
+        cached = answer_cache.lookup(key)
+        try:
+            if cached is not None:
+                first_token_at = time.perf_counter()
+                yield sse_event({"token": cached})
+            else:
+                parts = []
+                async for token in stream_completion(query, context):
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    parts.append(token)
+                    yield sse_event({"token": token})
+                answer_cache.put(key, "".join(parts))
+        except AIAssistantError as e:
+            yield sse_event({"error": str(e)}, event="error")
+
+        finished = time.perf_counter()
+        timing = {
+            "ttfb_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+            "total_ms": round((finished - started) * 1000, 1),
+            "cached": cached is not None,
+        }
+        logger.info("ask/stream %s ttfb_ms=%s total_ms=%s", retrieval["instrument"], timing["ttfb_ms"], timing["total_ms"])
+        yield sse_event(timing, event="done")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=sse_headers)
+
+@app.post("/ask/batch")
+async def ask_batch_endpoint(request: Request):
+    if not request.session.get("user"):
+        return JSONResponse({"error": "Not authenticated."}, status_code=401)
+    try:
+        items, concurrency, ordered = ask_batch.parse_batch(await request.json())
+    except ValueError as e:  # includes malformed JSON
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    async def lines():
+        async for result in ask_batch.run_batch(items, concurrency, ordered):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@app.get("/ask/cache-stats")
+async def ask_cache_stats(request: Request):
+    if not can_view_stats(request):
+        return JSONResponse({"error": "Not authorized."}, status_code=403)
+    return JSONResponse({**answer_cache.stats(), "upstream": llm_client.stats()})
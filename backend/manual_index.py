@@ -0,0 +1,424 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+MANUALS_DIR = "manuals"
+INDEX_DIR = os.path.join(MANUALS_DIR, ".index")
+INDEX_VERSION = 1
+
+# Retrieval tuning (override via environment)
+CHUNK_TOKENS = int(os.getenv("MANUAL_CHUNK_TOKENS", "200"))
+TOP_K = int(os.getenv("MANUAL_TOP_K", "4"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("MANUAL_CONTEXT_TOKENS", "1500"))
+# Cross-manual routing: at most this many manuals per answer, each scoring at
+# least ROUTE_MIN_RATIO of the best manual's top section.
+ROUTE_MAX_MANUALS = int(os.getenv("MANUAL_ROUTE_MAX_MANUALS", "2"))
+ROUTE_MIN_RATIO = float(os.getenv("MANUAL_ROUTE_MIN_RATIO", "0.5"))
+
+# Answer cache "instrument" for questions routed across all manuals.
+ROUTED = "*"
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Instrument names become file names under MANUALS_DIR and INDEX_DIR.
+_INSTRUMENT_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it of on or the this to what when "
+    "where which why with do does my you your can should".split()
+)
+
+_cache = {}
+_lock = threading.Lock()
+_global = None
+_global_lock = threading.Lock()
+
+
+class InvalidInstrument(ValueError):
+    """The name cannot be a manual's: it would not map to a file in MANUALS_DIR."""
+
+
+def check_instrument(instrument: str) -> str:
+    """Return ``instrument`` if it is a valid manual name, else raise InvalidInstrument."""
+    if not isinstance(instrument, str) or not _INSTRUMENT_RE.fullmatch(instrument):
+        raise InvalidInstrument("Instrument names may only contain letters, digits, '-' and '_'.")
+    return instrument
+
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    # Llama-style tokenizers average roughly four characters per token on English text.
+    return max(1, (len(text) + 3) // 4) if text else 0
+
+
+def split_sections(text: str, max_tokens: int = CHUNK_TOKENS) -> list:
+    """Split a manual into (start, end) character spans of at most ~max_tokens each.
+
+    Paragraphs (blank-line separated) are kept together where possible; a paragraph
+    that is too large on its own is split on line boundaries.
+    """
+    spans = []
+    for match in re.finditer(r"[^\n]+(?:\n(?!\s*\n)[^\n]*)*", text):
+        start, end = match.span()
+        if estimate_tokens(text[start:end]) <= max_tokens:
+            spans.append((start, end))
+            continue
+        for line in re.finditer(r"[^\n]+", text[start:end]):
+            spans.append((start + line.start(), start + line.end()))
+
+    chunks = []
+    cur_start = cur_end = None
+    for start, end in spans:
+        if not text[start:end].strip():
+            continue
+        if cur_start is not None and estimate_tokens(text[cur_start:end]) <= max_tokens:
+            cur_end = end
+            continue
+        if cur_start is not None:
+            chunks.append((cur_start, cur_end))
+        cur_start, cur_end = start, end
+    if cur_start is not None:
+        chunks.append((cur_start, cur_end))
+    return chunks
+
+
+def build_index(text: str) -> dict:
+    chunks = []
+    postings = {}
+    for i, (start, end) in enumerate(split_sections(text)):
+        terms = tokenize(text[start:end])
+        chunks.append({
+            "start": start,
+            "end": end,
+            "length": len(terms),
+            "tokens": estimate_tokens(text[start:end]),
+        })
+        for term, tf in Counter(terms).items():
+            postings.setdefault(term, []).append([i, tf])
+
+    total = sum(c["length"] for c in chunks)
+    return {
+        "version": INDEX_VERSION,
+        "chunks": chunks,
+        "postings": postings,
+        "avgdl": total / len(chunks) if chunks else 0.0,
+        "manual_tokens": estimate_tokens(text),
+    }
+
+
+class ManualIndex:
+    def __init__(self, instrument: str, text: str, data: dict, stamp: tuple):
+        self.instrument = instrument
+        self.text = text
+        self.chunks = data["chunks"]
+        self.postings = data["postings"]
+        self.avgdl = data["avgdl"] or 1.0
+        self.manual_tokens = data["manual_tokens"]
+        self.content_hash = data["content_hash"]
+        self.stamp = stamp
+
+    def chunk_text(self, i: int) -> str:
+        chunk = self.chunks[i]
+        return self.text[chunk["start"]:chunk["end"]]
+
+    def score(self, query: str) -> dict:
+        n = len(self.chunks)
+        scores = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for i, tf in plist:
+                dl = self.chunks[i]["length"]
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / self.avgdl)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        return scores
+
+    def search(self, query: str, top_k: int = TOP_K, token_budget: int = CONTEXT_TOKEN_BUDGET) -> dict:
+        """Return the best-matching sections that fit in ``token_budget``, in manual order."""
+        scores = self.score(query)
+        if scores:
+            ranked = sorted(scores, key=lambda i: (-scores[i], i))
+        else:
+            # Nothing matched: fall back to the start of the manual.
+            ranked = list(range(len(self.chunks)))
+
+        picked = []
+        used = 0
+        for i in ranked:
+            if len(picked) >= top_k:
+                break
+            cost = self.chunks[i]["tokens"]
+            if picked and used + cost > token_budget:
+                continue
+            picked.append(i)
+            used += cost
+        picked.sort()
+
+        return {
+            "instrument": self.instrument,
+            "sections": [self.chunk_text(i) for i in picked],
+            "section_ids": picked,
+            "scores": [round(scores.get(i, 0.0), 4) for i in picked],
+            "sources": [{"instrument": self.instrument, "section_ids": picked}],
+            "content_hash": self.content_hash,
+            "usage": {
+                "context_tokens": used,
+                "query_tokens": estimate_tokens(query),
+                "budget": token_budget,
+                "manual_tokens": self.manual_tokens,
+                "sections": len(picked),
+                "total_sections": len(self.chunks),
+            },
+        }
+
+
+def manual_path(instrument: str) -> str:
+    return os.path.join(MANUALS_DIR, f"{check_instrument(instrument)}.txt")
+
+
+def _index_path(instrument: str) -> str:
+    return os.path.join(INDEX_DIR, f"{check_instrument(instrument)}.json")
+
+
+def _file_stamp(path: str) -> tuple:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_persisted(instrument: str, content_hash: str):
+    try:
+        with open(_index_path(instrument), "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != INDEX_VERSION or data.get("content_hash") != content_hash:
+        return None
+    return data
+
+
+def _persist(instrument: str, data: dict):
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    tmp_path = _index_path(instrument) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, _index_path(instrument))
+
+
+def get_index(instrument: str):
+    """Return the index for ``instrument``, rebuilding it if the manual changed.
+
+    Returns None if there is no manual for the instrument; raises
+    InvalidInstrument if the name is not a valid manual name.
+    """
+    path = manual_path(instrument)
+    try:
+        stamp = _file_stamp(path)
+    except FileNotFoundError:
+        return None
+
+    with _lock:
+        index = _cache.get(instrument)
+        if index is not None and index.stamp == stamp:
+            return index
+
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+        data = _load_persisted(instrument, content_hash)
+        if data is None:
+            data = build_index(text)
+            data["content_hash"] = content_hash
+            _persist(instrument, data)
+
+        index = ManualIndex(instrument, text, data, stamp)
+        _cache[instrument] = index
+        return index
+
+
+def install(instrument: str, text: str, source: dict = None):
+    """Make ``text`` the manual for ``instrument``, with its index built and persisted.
+
+    The index is written before the text replaces the old manual, so readers in
+    other processes find a matching index as soon as they see the new text.
+    """
+    global _global
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    data = build_index(text)
+    data["content_hash"] = content_hash
+    data["source"] = source
+    path = manual_path(instrument)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(MANUALS_DIR, exist_ok=True)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    with _lock:
+        _persist(instrument, data)
+        os.replace(tmp_path, path)
+        index = ManualIndex(instrument, text, data, _file_stamp(path))
+        _cache[instrument] = index
+    with _global_lock:
+        _global = None
+    return index
+
+
+def invalidate(instrument: str):
+    global _global
+    with _lock:
+        _cache.pop(instrument, None)
+    with _global_lock:
+        _global = None
+    try:
+        os.remove(_index_path(instrument))
+    except FileNotFoundError:
+        pass
+
+
+def retrieve(instrument: str, query: str, top_k: int = TOP_K, token_budget: int = CONTEXT_TOKEN_BUDGET):
+    index = get_index(instrument)
+    if index is None:
+        return None
+    return index.search(query, top_k=top_k, token_budget=token_budget)
+
+
+# ---------------------- Cross-manual routing ---------------------
+class GlobalIndex:
+    """One BM25 index over the sections of every manual.
+
+    Built by merging the per-manual postings, with IDF and average length taken
+    over all sections, so scores are comparable between manuals. Each posting
+    stores its finished BM25 term weight, so a query only sums the postings of
+    its own terms.
+    """
+
+    def __init__(self, indexes: list, dir_stamp):
+        self.indexes = indexes
+        self.dir_stamp = dir_stamp
+        self.docs = []  # global section id -> (manual number, section id, length, tokens)
+        postings = {}
+        for m, index in enumerate(indexes):
+            base = len(self.docs)
+            self.docs.extend((m, i, c["length"], c["tokens"]) for i, c in enumerate(index.chunks))
+            for term, plist in index.postings.items():
+                postings.setdefault(term, []).extend((base + i, tf) for i, tf in plist)
+        n = len(self.docs)
+        avgdl = (sum(d[2] for d in self.docs) / n if n else 0.0) or 1.0
+        norms = [BM25_K1 * (1 - BM25_B + BM25_B * d[2] / avgdl) for d in self.docs]
+        self.postings = {}
+        for term, plist in postings.items():
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            self.postings[term] = [(d, idf * tf * (BM25_K1 + 1) / (tf + norms[d])) for d, tf in plist]
+        digest = hashlib.sha256()
+        for index in indexes:
+            digest.update(f"{index.instrument}:{index.content_hash};".encode())
+        self.content_hash = digest.hexdigest()
+
+    def score(self, query: str) -> dict:
+        scores = {}
+        get = scores.get
+        for term in set(tokenize(query)):
+            for d, weight in self.postings.get(term, ()):
+                scores[d] = get(d, 0.0) + weight
+        return scores
+
+    def route(self, query: str, top_k: int = TOP_K, token_budget: int = CONTEXT_TOKEN_BUDGET,
+              max_manuals: int = ROUTE_MAX_MANUALS):
+        """Pick the best-matching manuals for ``query`` and their best sections.
+
+        Returns None if no section matches any query term.
+        """
+        scores = self.score(query)
+        if not scores:
+            return None
+        best = {}  # manual number -> its best section score
+        for d, score in scores.items():
+            m = self.docs[d][0]
+            if score > best.get(m, 0.0):
+                best[m] = score
+        top = max(best.values())
+        manuals = sorted((m for m in best if best[m] >= top * ROUTE_MIN_RATIO), key=lambda m: (-best[m], m))
+        manuals = manuals[:max_manuals]
+
+        # Only the chosen manuals' sections need ranking.
+        ranked = sorted((d for d in scores if self.docs[d][0] in manuals), key=lambda d: (-scores[d], d))
+        picked = []
+        used = 0
+        for d in ranked:
+            if len(picked) >= top_k:
+                break
+            cost = self.docs[d][3]
+            if picked and used + cost > token_budget:
+                continue
+            picked.append(d)
+            used += cost
+        picked.sort()
+
+        sources = []
+        sections = []
+        for m in manuals:
+            index = self.indexes[m]
+            ids = [self.docs[d][1] for d in picked if self.docs[d][0] == m]
+            if not ids:
+                continue
+            sources.append({"instrument": index.instrument, "section_ids": ids,
+                            "score": round(best[m], 4)})
+            sections.extend(f"[{index.instrument} manual]\n{index.chunk_text(i)}" for i in ids)
+
+        return {
+            "instrument": ROUTED,
+            "sections": sections,
+            "sources": sources,
+            "content_hash": self.content_hash,
+            "usage": {
+                "context_tokens": used,
+                "query_tokens": estimate_tokens(query),
+                "budget": token_budget,
+                "manual_tokens": sum(self.indexes[m].manual_tokens for m in manuals),
+                "sections": len(picked),
+                "total_sections": len(self.docs),
+                "manuals_searched": len(self.indexes),
+            },
+        }
+
+
+def list_instruments() -> list:
+    try:
+        names = os.listdir(MANUALS_DIR)
+    except FileNotFoundError:
+        return []
+    # Files whose names are not valid instrument names are not manuals.
+    return sorted(name[:-4] for name in names if name.endswith(".txt") and _INSTRUMENT_RE.fullmatch(name[:-4]))
+
+
+def get_global_index():
+    """Return the cross-manual index, rebuilding it after uploads or when manuals/ changes."""
+    global _global
+    try:
+        dir_stamp = os.stat(MANUALS_DIR).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _global_lock:
+        if _global is not None and _global.dir_stamp == dir_stamp:
+            return _global
+        indexes = [index for index in map(get_index, list_instruments()) if index is not None]
+        _global = GlobalIndex(indexes, dir_stamp)
+        return _global
+
+
+def route(query: str, top_k: int = TOP_K, token_budget: int = CONTEXT_TOKEN_BUDGET):
+    """Retrieve context for ``query`` from whichever manuals match it best."""
+    index = get_global_index()
+    if index is None:
+        return None
+    return index.route(query, top_k=top_k, token_budget=token_budget)
@@ -0,0 +1,296 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+import uuid
+
+from backend import manual_index
+from backend.ai_cache import answer_cache
+
+MANUAL_MAX_BYTES = int(os.getenv("MANUAL_MAX_BYTES", str(100 * 1024 * 1024)))
+MANUAL_CHUNK_SIZE = int(os.getenv("MANUAL_CHUNK_SIZE", str(1024 * 1024)))
+# Uploads larger than this are ingested by the background worker.
+MANUAL_INLINE_MAX_BYTES = int(os.getenv("MANUAL_INLINE_MAX_BYTES", str(1024 * 1024)))
+
+UPLOAD_DIR = os.path.join(manual_index.MANUALS_DIR, ".uploads")
+
+_CONTROL_RE = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+_HYPHEN_BREAK_RE = re.compile(r"(\w)-\n(\w)")
+_SPACES_RE = re.compile(r"[ \t\xa0]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+logger = logging.getLogger(__name__)
+
+
+class ManualRejected(ValueError):
+    """The upload cannot be accepted (bad name, too large, unsupported format)."""
+
+
+class IngestError(Exception):
+    """The manual was received but no usable text could be produced from it."""
+
+
+class UploadedManual:
+    def __init__(self, instrument, path, fmt, size, sha256):
+        self.instrument = instrument
+        self.path = path
+        self.fmt = fmt
+        self.size = size
+        self.sha256 = sha256
+
+
+def detect_format(filename: str, head: bytes) -> str:
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in ("", ".txt", ".text", ".md"):
+        return "txt"
+    raise ManualRejected("Manuals must be plain text (.txt) or PDF files.")
+
+
+def check_available(fmt: str):
+    """Raise ManualRejected before the upload is queued if ``fmt`` cannot be read here."""
+    if fmt == "pdf":
+        try:
+            import pypdf  # noqa: F401
+        except ImportError as e:
+            raise ManualRejected("PDF manuals require the 'pypdf' package.") from e
+
+
+async def receive(instrument: str, upload) -> UploadedManual:
+    """Stream ``upload`` to a scratch file in chunks, hashing it on the way."""
+    try:
+        manual_index.check_instrument(instrument)
+    except manual_index.InvalidInstrument as e:
+        raise ManualRejected(str(e)) from e
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = await upload.read(MANUAL_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MANUAL_MAX_BYTES:
+                    raise ManualRejected(f"Manual exceeds the {MANUAL_MAX_BYTES // (1024 * 1024)} MB limit.")
+                if not head:
+                    head = chunk[:8]
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+        fmt = detect_format(upload.filename, head)
+        check_available(fmt)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return UploadedManual(instrument, path, fmt, size, digest.hexdigest())
+
+
+# ---------------------- Text extraction ---------------------
+def _read_txt(path: str) -> tuple:
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        return raw.decode("utf-8-sig"), None
+    except UnicodeDecodeError:
+        return raw.decode("cp1252", errors="replace"), None
+
+
+def _read_pdf(path: str) -> tuple:
+    from pypdf import PdfReader
+    from pypdf.errors import PdfReadError
+
+    try:
+        reader = PdfReader(path)
+        pages = [page.extract_text() or "" for page in reader.pages]
+    except (PdfReadError, ValueError, KeyError) as e:
+        raise IngestError(f"Could not read the PDF: {e}") from e
+    # Page breaks become paragraph breaks, so no section spans two pages' layout.
+    return "\n\n".join(pages), len(pages)
+
+
+EXTRACTORS = {
+    "txt": _read_txt,
+    "pdf": _read_pdf,
+}
+
+
+def normalize_text(text: str, fmt: str) -> str:
+    """Canonical form stored as the manual: NFKC, '\\n' line ends, no control
+    characters, single spaces, at most one blank line between paragraphs."""
+    text = unicodedata.normalize("NFKC", text).replace("\r\n", "\n").replace("\r", "\n")
+    text = _CONTROL_RE.sub("", text)
+    if fmt == "pdf":
+        # Words hyphenated across a PDF line break.
+        text = _HYPHEN_BREAK_RE.sub(r"\1\2", text)
+    text = "\n".join(_SPACES_RE.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES_RE.sub("\n\n", text).strip() + "\n"
+
+
+def ingest(manual: UploadedManual) -> dict:
+    """Extract, normalize and section the manual and install it with its index.
+
+    Blocking; runs in a worker thread. Returns a summary of the artifacts.
+    """
+    started = time.perf_counter()
+    try:
+        text, pages = EXTRACTORS[manual.fmt](manual.path)
+        text = normalize_text(text, manual.fmt)
+        if not text.strip():
+            raise IngestError("No text could be extracted from the manual.")
+        source = {
+            "format": manual.fmt,
+            "bytes": manual.size,
+            "sha256": manual.sha256,
+            "pages": pages,
+            "ingested_at": time.time(),
+        }
+        index = manual_index.install(manual.instrument, text, source)
+    finally:
+        try:
+            os.remove(manual.path)
+        except FileNotFoundError:
+            pass
+    return {
+        "sections": len(index.chunks),
+        "manual_tokens": index.manual_tokens,
+        "content_hash": index.content_hash,
+        "source": source,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+# ---------------------- Status ---------------------
+def _status_path(instrument: str) -> str:
+    return os.path.join(manual_index.INDEX_DIR, f"{instrument}.status.json")
+
+
+def write_status(instrument: str, state: str, **info):
+    # On disk, so any worker can report on an upload another worker is processing.
+    os.makedirs(manual_index.INDEX_DIR, exist_ok=True)
+    tmp_path = f"{_status_path(instrument)}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"instrument": instrument, "state": state, "updated_at": time.time(), **info}, f)
+    os.replace(tmp_path, _status_path(instrument))
+
+
+def read_status(instrument: str):
+    try:
+        manual_index.check_instrument(instrument)
+    except manual_index.InvalidInstrument:
+        return None
+    try:
+        with open(_status_path(instrument)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    # Manuals placed in manuals/ by hand have no status file.
+    if os.path.exists(manual_index.manual_path(instrument)):
+        return {"instrument": instrument, "state": "ready"}
+    return None
+
+
+# ---------------------- Pipeline ---------------------
+class IngestQueue:
+    """Background worker for large manuals.
+
+    Jobs run one at a time in upload order, so a later upload of the same
+    instrument always wins. The extraction itself runs in a thread.
+    """
+
+    def __init__(self):
+        self._queue = None
+        self._worker = None
+        self._pending = {}  # instrument -> jobs queued or running
+        self.processed = 0
+        self.failed = 0
+
+    def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            # Drop the scratch files of jobs that never ran.
+            while not self._queue.empty():
+                manual = self._queue.get_nowait()
+                write_status(manual.instrument, "failed", error="Server stopped before the manual was processed.")
+                os.remove(manual.path)
+            self._pending.clear()
+
+    def is_pending(self, instrument: str) -> bool:
+        return instrument in self._pending
+
+    def submit(self, manual: UploadedManual):
+        self.start()
+        self._pending[manual.instrument] = self._pending.get(manual.instrument, 0) + 1
+        write_status(manual.instrument, "queued", bytes=manual.size, format=manual.fmt)
+        self._queue.put_nowait(manual)
+
+    async def _run(self):
+        while True:
+            manual = await self._queue.get()
+            try:
+                await run_ingest(manual)
+                self.processed += 1
+            except IngestError as e:
+                self.failed += 1
+                logger.warning("Manual for %s rejected: %s", manual.instrument, e)
+            except Exception:
+                self.failed += 1
+                logger.exception("Ingesting the manual for %s failed", manual.instrument)
+            finally:
+                if self._pending[manual.instrument] == 1:
+                    del self._pending[manual.instrument]
+                else:
+                    self._pending[manual.instrument] -= 1
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "pending_instruments": len(self._pending),
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+
+async def run_ingest(manual: UploadedManual) -> dict:
+    write_status(manual.instrument, "processing", bytes=manual.size, format=manual.fmt)
+    try:
+        summary = await asyncio.to_thread(ingest, manual)
+    except Exception as e:
+        write_status(manual.instrument, "failed", error=str(e))
+        raise
+    answer_cache.invalidate(manual.instrument)
+    write_status(manual.instrument, "ready", **summary)
+    return summary
+
+
+ingest_queue = IngestQueue()
+
+
+async def process(manual: UploadedManual):
+    """Ingest small manuals now and queue large ones.
+
+    Returns the summary, or None if the manual was queued. An instrument with
+    a queued upload is always queued again, so uploads install in order.
+    """
+    if manual.size <= MANUAL_INLINE_MAX_BYTES and not ingest_queue.is_pending(manual.instrument):
+        return await run_ingest(manual)
+    ingest_queue.submit(manual)
+    return None
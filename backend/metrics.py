@@ -0,0 +1,249 @@
+import contextvars
+import hmac
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Requests slower than this are logged with their SQL; 0 disables the log.
+METRICS_SLOW_REQUEST_MS = float(os.getenv("METRICS_SLOW_REQUEST_MS", "0"))
+METRICS_SLOW_MAX_STATEMENTS = int(os.getenv("METRICS_SLOW_MAX_STATEMENTS", "50"))
+# Lets a scraper read /metrics and the stats endpoints without a staff session
+# ("Authorization: Bearer <token>"); unset, only staff sessions can.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+logger = logging.getLogger(__name__)
+
+# Per-request SQL accounting, set by the middleware and filled by engine events.
+_request = contextvars.ContextVar("metrics_request", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, values, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, le)} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, values)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labels, values)} {series[-1]}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to serve a request, including the streamed body.",
+    ("method", "route", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_sql_queries", "SQL statements issued while serving a request.",
+    ("method", "route"), COUNT_BUCKETS,
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "http_request_sql_seconds", "Time spent in SQL while serving a request.",
+    ("method", "route"),
+)
+SQL_DURATION = Histogram(
+    "db_query_duration_seconds", "Duration of individual SQL statements.",
+    ("operation",), QUERY_BUCKETS,
+)
+LLM_DURATION = Histogram(
+    "llm_request_duration_seconds", "Duration of AI assistant completions, including retries.",
+    ("mode", "outcome"),
+)
+LLM_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds", "Time until the first streamed token arrives.",
+)
+REPORT_RENDER = Histogram(
+    "report_render_duration_seconds", "Time to render a PDF report.", ("kind",),
+)
+REPORT_ROWS = Counter("report_rows_rendered_total", "Rows written into PDF reports.", ("kind",))
+SLOW_REQUESTS = Counter("http_slow_requests_total", "Requests over METRICS_SLOW_REQUEST_MS.", ("route",))
+
+METRICS = [
+    REQUEST_DURATION, REQUEST_QUERIES, REQUEST_SQL_SECONDS, SQL_DURATION,
+    LLM_DURATION, LLM_FIRST_TOKEN, REPORT_RENDER, REPORT_ROWS, SLOW_REQUESTS,
+]
+
+
+class _RequestStats:
+    __slots__ = ("queries", "sql_seconds", "statements")
+
+    def __init__(self, capture: bool):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = [] if capture else None
+
+
+# ---------------------- SQL instrumentation ---------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_started"].pop()
+    elapsed = time.perf_counter() - started
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    SQL_DURATION.observe(elapsed, operation)
+    stats = _request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.sql_seconds += elapsed
+        if stats.statements is not None and len(stats.statements) < METRICS_SLOW_MAX_STATEMENTS:
+            stats.statements.append((round(elapsed * 1000, 2), " ".join(statement.split())[:500]))
+
+
+def _handle_error(context):
+    # after_cursor_execute does not fire for failed statements.
+    if context.connection is not None and context.connection.info.get("metrics_started"):
+        context.connection.info["metrics_started"].pop()
+
+
+def instrument_engine(engine):
+    """Time every statement on ``engine`` (pass ``async_engine.sync_engine`` for async engines)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# ---------------------- Request middleware ---------------------
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed bodies are timed to their last byte."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = _RequestStats(capture=METRICS_SLOW_REQUEST_MS > 0)
+        token = _request.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request.reset(token)
+            # The route template, not the raw path, keeps label cardinality bounded.
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_DURATION.observe(elapsed, method, route, status)
+            REQUEST_QUERIES.observe(stats.queries, method, route)
+            REQUEST_SQL_SECONDS.observe(stats.sql_seconds, method, route)
+            if METRICS_SLOW_REQUEST_MS and elapsed * 1000 >= METRICS_SLOW_REQUEST_MS:
+                SLOW_REQUESTS.inc(route)
+                logger.warning(
+                    "Slow request %s %s (%s): %.1f ms, %d SQL statements in %.1f ms\n%s",
+                    method, scope.get("path"), route, elapsed * 1000, stats.queries, stats.sql_seconds * 1000,
+                    "\n".join(f"  [{ms} ms] {sql}" for ms, sql in stats.statements),
+                )
+
+
+# ---------------------- Timers ---------------------
+@contextmanager
+def timed(histogram: Histogram, *label_values):
+    """Observe the duration of the block; ``outcome`` ("ok"/"error") is appended to the labels."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        histogram.observe(time.perf_counter() - started, *label_values, outcome)
+
+
+def has_token(request) -> bool:
+    """True if the request carries METRICS_TOKEN as its bearer token."""
+    if not METRICS_TOKEN:
+        return False
+    return hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}")
+
+
+def render(extra=()) -> str:
+    """Prometheus text exposition of all metrics plus ``extra`` pre-rendered lines."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
+
+
+def gauges(prefix: str, help: str, values: dict) -> list:
+    """Render numeric entries of a stats dict as gauges, e.g. the DB pool snapshot."""
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{key}"
+        lines += [f"# HELP {name} {help} ({key}).", f"# TYPE {name} gauge", f"{name} {value}"]
+    return lines
@@ -0,0 +1,107 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from sqlalchemy import select, update
+
+from backend.db.models import User
+
+TEMPLATE_DIR = "backend/templates"
+# Compiled templates are shared by all workers; empty disables the cache.
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", "template_cache")
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "2000"))
+FRAGMENT_CACHE_MAX_BYTES = int(os.getenv("FRAGMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+class _BytecodeCache(FileSystemBytecodeCache):
+    """Creates its directory on the first write rather than at import."""
+
+    def dump_bytecode(self, bucket):
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+
+def template_environment() -> Environment:
+    return Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        bytecode_cache=_BytecodeCache(TEMPLATE_CACHE_DIR) if TEMPLATE_CACHE_DIR else None,
+    )
+
+
+def template_tag(*names: str) -> str:
+    """Short fingerprint of the given template files, so edits change ETags and fragment keys."""
+    digest = hashlib.sha256()
+    for name in names:
+        st = os.stat(os.path.join(TEMPLATE_DIR, name))
+        digest.update(f"{name}:{st.st_mtime_ns}:{st.st_size};".encode())
+    return digest.hexdigest()[:16]
+
+
+def make_etag(*parts) -> str:
+    return '"' + hashlib.sha256(repr(parts).encode()).hexdigest()[:32] + '"'
+
+
+# ---------------------- Data versions ---------------------
+async def data_version(db, user_id):
+    """The user's current data version, or None if there is no such user."""
+    if user_id is None:
+        return None
+    return await db.scalar(select(User.data_version).where(User.id == user_id))
+
+
+async def bump_data_version(db, user_id):
+    """Mark the user's job cards / service orders as changed. Call before the commit."""
+    if user_id is not None:
+        await db.execute(update(User).where(User.id == user_id).values(data_version=User.data_version + 1))
+
+
+# ---------------------- Fragment cache ---------------------
+class FragmentCache:
+    """In-process LRU of rendered HTML fragments with a memory cap.
+
+    Keys include the owner's data version, so writes never need to reach the
+    cache: entries for old versions are simply no longer asked for and age out.
+    """
+
+    def __init__(self, max_entries: int = FRAGMENT_CACHE_MAX_ENTRIES, max_bytes: int = FRAGMENT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> html
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get_or_render(self, key, render):
+        """Return the HTML cached for ``key``, awaiting ``render()`` on a miss."""
+        html = self._entries.get(key)
+        if html is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+        self.misses += 1
+        html = await render()
+        if len(html) <= self.max_bytes:
+            if key in self._entries:  # filled by a concurrent miss
+                self._bytes -= len(self._entries.pop(key))
+            self._entries[key] = html
+            self._bytes += len(html)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+        return html
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,115 @@
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def clamp_page_size(limit) -> int:
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return PAGE_SIZE_DEFAULT
+    return max(1, min(limit, PAGE_SIZE_MAX))
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    return ["v", value]
+
+
+def _load(item, column):
+    """Decode one cursor value, checking it is the type ``column`` holds."""
+    kind, value = item
+    expected = column.type.python_type
+    if kind == "dt" and expected is datetime:
+        return datetime.fromisoformat(value)
+    if kind == "d" and expected is date:
+        return date.fromisoformat(value)
+    if kind == "v":
+        if value is None and column.nullable:
+            return value
+        if type(value) is expected or (expected is float and type(value) is int):
+            return value
+    raise InvalidCursor("Invalid cursor.")
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps([_dump(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    """Values of ``columns`` from a cursor; raises InvalidCursor for anything
+    that is not one ``encode_cursor`` could have produced for them."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        items = json.loads(raw)
+        if not isinstance(items, list) or len(items) != len(columns):
+            raise InvalidCursor("Invalid cursor.")
+        return [_load(item, column) for item, column in zip(items, columns)]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor.") from e
+
+
+def keyset_condition(columns, values, descending: bool):
+    """Rows strictly after ``values`` in (columns...) order.
+
+    Expanded as ``c1 < v1 OR (c1 = v1 AND c2 < v2) ...`` rather than a row-value
+    comparison so it works on every backend and still uses a composite index.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        after = column < values[i] if descending else column > values[i]
+        equal = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, after) if equal else after)
+    return or_(*clauses)
+
+
+async def keyset_page(db, stmt, columns, cursor=None, limit=PAGE_SIZE_DEFAULT,
+                      descending: bool = True, scalars: bool = True):
+    """Fetch one page of ``stmt`` ordered by ``columns``.
+
+    ``columns`` must end in a unique column (normally the primary key) so the
+    order is total. Returns ``(rows, next_cursor)``; ``next_cursor`` is None on
+    the last page.
+    """
+    limit = clamp_page_size(limit)
+    if cursor:
+        stmt = stmt.where(keyset_condition(columns, decode_cursor(cursor, columns), descending))
+    stmt = stmt.order_by(*[c.desc() if descending else c.asc() for c in columns]).limit(limit + 1)
+
+    result = await db.execute(stmt)
+    rows = (result.scalars() if scalars else result).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return rows, next_cursor
+
+
+def to_dict(obj, exclude=()) -> dict:
+    """JSON-friendly dict of a model instance's (or row's) columns."""
+    if hasattr(obj, "__table__"):
+        keys = [c.key for c in obj.__table__.columns]
+    else:
+        keys = list(obj._fields)
+    data = {}
+    for key in keys:
+        if key in exclude:
+            continue
+        value = getattr(obj, key)
+        data[key] = value.isoformat() if isinstance(value, (date, datetime)) else value
+    return data
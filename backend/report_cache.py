@@ -0,0 +1,233 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+
+from backend.db.database import AsyncSessionLocal
+from backend.reports import render_report
+
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "report_cache")
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+REPORT_CACHE_REBUILD_DELAY = float(os.getenv("REPORT_CACHE_REBUILD_DELAY", "2"))
+REPORT_CACHE_REBUILD_MAX = int(os.getenv("REPORT_CACHE_REBUILD_MAX", "8"))
+
+logger = logging.getLogger(__name__)
+
+
+class CachedReport:
+    def __init__(self, kind, filters, path, size, etag, stats, stamp):
+        self.cached = False
+        self.stamp = stamp  # the kind's stamp when rendering started
+        self.kind = kind
+        self.filters = filters
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.stats = stats
+
+
+def _write_file(src, path: str) -> tuple:
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = src.read(64 * 1024)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        src.close()
+    return size, f'"{digest.hexdigest()[:32]}"'
+
+
+class ReportCache:
+    """Disk-backed LRU cache of rendered PDF reports.
+
+    Entries are keyed by report kind and filters. Writes to a table call
+    ``invalidate(kind)``, which drops that kind's entries and rebuilds the
+    recently used ones in the background. Each worker process keeps its own
+    directory under REPORT_CACHE_DIR.
+
+    Invalidation also replaces the kind's stamp file in REPORT_CACHE_DIR, which
+    every worker (and the bulk import CLI) shares. An entry rendered under an
+    older stamp is never served, so a write through one worker reaches the
+    others on their next request for the report.
+    """
+
+    def __init__(self, root: str = REPORT_CACHE_DIR, max_bytes: int = REPORT_CACHE_MAX_BYTES):
+        self.root = root
+        self.dir = None
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> CachedReport
+        self._bytes = 0
+        self._building = {}            # (key, stamp) -> asyncio.Task
+        self._rebuilds = {}            # kind -> asyncio.Task
+        self._wanted = {}              # kind -> OrderedDict(key -> filters) awaiting rebuild
+        self._orphans = []             # (created, path) of results served once but not kept
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(kind: str, filters: dict) -> str:
+        raw = json.dumps([kind, sorted((k, str(v)) for k, v in filters.items())])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _stamp_path(self, kind: str) -> str:
+        return os.path.join(self.root, f"{kind}.stamp")
+
+    def stamp(self, kind: str) -> str:
+        """The kind's current stamp; changes whenever any process invalidates it."""
+        try:
+            with open(self._stamp_path(kind)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return ""
+
+    def mark_stale(self, kind: str):
+        """Replace the kind's stamp, so no process serves its cached reports again."""
+        os.makedirs(self.root, exist_ok=True)
+        path = self._stamp_path(kind)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, path)
+
+    def start(self):
+        # Resolved at startup so forked workers do not share a directory.
+        self.dir = os.path.join(self.root, str(os.getpid()))
+        os.makedirs(self.dir, exist_ok=True)
+
+    def close(self):
+        for task in list(self._rebuilds.values()) + list(self._building.values()):
+            task.cancel()
+        self._entries.clear()
+        self._orphans.clear()
+        self._bytes = 0
+        if self.dir:
+            shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        entry.cached = False
+        self._bytes -= entry.size
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+    def _install(self, key, entry):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while len(self._entries) > 1 and self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    async def _build(self, key, kind, filters, stamp):
+        if self.dir is None:
+            self.start()
+        self._sweep_orphans()
+        async with AsyncSessionLocal() as db:
+            fileobj, stats = await render_report(db, kind, filters)
+        path = os.path.join(self.dir, f"{key}-{uuid.uuid4().hex[:8]}.pdf")
+        size, etag = await asyncio.to_thread(_write_file, fileobj, path)
+        entry = CachedReport(kind, filters, path, size, etag, stats, stamp)
+        # A write landed while rendering: serve this result once but do not keep it.
+        if self.stamp(kind) == stamp:
+            self._install(key, entry)
+            entry.cached = True
+        else:
+            self._orphans.append((time.monotonic(), path))
+        return entry
+
+    def _sweep_orphans(self, max_age: float = 60.0):
+        # Waiters open the file as soon as the build finishes, so a minute is ample.
+        cutoff = time.monotonic() - max_age
+        keep = []
+        for created, path in self._orphans:
+            if created > cutoff:
+                keep.append((created, path))
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._orphans = keep
+
+    async def get(self, kind: str, filters: dict) -> CachedReport:
+        """Return a cached report, rendering it (once per key) on a miss."""
+        key = self.make_key(kind, filters)
+        stamp = self.stamp(kind)
+        entry = self._entries.get(key)
+        if entry is not None and entry.stamp != stamp:
+            # Invalidated by another process.
+            self._remove(key)
+            entry = None
+        if entry is not None and os.path.exists(entry.path):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        build_key = (key, stamp)
+        task = self._building.get(build_key)
+        if task is None:
+            task = asyncio.create_task(self._build(key, kind, filters, build_key[1]))
+            self._building[build_key] = task
+            task.add_done_callback(lambda _: self._building.pop(build_key, None))
+        return await asyncio.shield(task)
+
+    def invalidate(self, kind: str):
+        self.mark_stale(kind)
+        wanted = self._wanted.setdefault(kind, OrderedDict())
+        for key, entry in [(k, e) for k, e in self._entries.items() if e.kind == kind]:
+            self._remove(key)
+            wanted[key] = entry.filters
+            wanted.move_to_end(key)
+        while len(wanted) > REPORT_CACHE_REBUILD_MAX:
+            wanted.popitem(last=False)
+        if wanted and kind not in self._rebuilds:
+            self._rebuilds[kind] = asyncio.create_task(self._rebuild(kind))
+
+    async def _rebuild(self, kind):
+        try:
+            # Debounce bursts of writes into one rebuild.
+            await asyncio.sleep(REPORT_CACHE_REBUILD_DELAY)
+            wanted = self._wanted.pop(kind, {})
+            # Most recently used first.
+            for key, filters in reversed(list(wanted.items())):
+                stamp = self.stamp(kind)
+                try:
+                    await self.get(kind, filters)
+                except Exception:
+                    logger.exception("Background rebuild of %s report failed", kind)
+                if self.stamp(kind) != stamp:
+                    self._wanted.setdefault(kind, OrderedDict())[key] = filters
+        finally:
+            self._rebuilds.pop(kind, None)
+        if self._wanted.get(kind):
+            self._rebuilds[kind] = asyncio.create_task(self._rebuild(kind))
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilding": sorted(self._rebuilds),
+            "pending_rebuilds": sum(len(w) for w in self._wanted.values()),
+        }
+
+
+report_cache = ReportCache()
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import DateTime, select
+
+from backend import metrics
+from backend.db.models import JobCard, ServiceOrder
+
+REPORT_BATCH_SIZE = int(os.getenv("REPORT_BATCH_SIZE", "500"))
+REPORT_SPOOL_BYTES = int(os.getenv("REPORT_SPOOL_BYTES", str(4 * 1024 * 1024)))
+REPORT_CHUNK_SIZE = 64 * 1024
+
+FILTER_NAMES = ("date_from", "date_to", "equipment", "hospital", "engineer")
+
+logger = logging.getLogger(__name__)
+
+
+class ReportSpec:
+    def __init__(self, kind, model, title, filename, date_column, text_filters, draw_row):
+        self.kind = kind
+        self.model = model
+        self.title = title
+        self.filename = filename
+        self.date_column = date_column
+        self.text_filters = text_filters
+        self.draw_row = draw_row
+
+
+def _fmt_date(value):
+    return value.strftime('%Y-%m-%d') if value else "-"
+
+
+def _draw_jobcard(page, job):
+    page.line(50, f"ID: {job.id}", 120, f"Equipment: {job.equipment_name}")
+    page.line(120, f"Engineer: {job.engineer_name or '-'}")
+    page.line(120, f"Type: {job.maintenance_type}, Date: {_fmt_date(job.date_of_service)}")
+    page.line(120, f"Spare Parts: {job.spare_parts_used or 'None'}", gap=30)
+
+
+def _draw_serviceorder(page, order):
+    page.line(50, f"ID: {order.id}", 120, f"Site / Hospital: {order.site_hospital}")
+    page.line(120, f"Engineer: {order.engineer_name}")
+    page.line(120, f"Purpose: {order.mission_purpose or '-'}")
+    page.line(120, f"Spare Parts: {order.spare_parts or 'None'}")
+    page.line(120, f"Arrival: {_fmt_date(order.arrival_date)}, Return: {_fmt_date(order.return_date)}")
+    page.line(120, f"Mission Fee: {order.mission_fee or 0:.2f}, Transport Fee: {order.transport_fee or 0:.2f}, "
+                   f"Total: {order.total_cost or 0:.2f}", gap=30)
+
+
+REPORTS = {
+    "jobcards": ReportSpec(
+        "jobcards", JobCard, "BiomedLink - Job Cards Report", "jobcards_report.pdf",
+        JobCard.date_of_service,
+        {"equipment": JobCard.equipment_name, "engineer": JobCard.engineer_name},
+        _draw_jobcard,
+    ),
+    "serviceorders": ReportSpec(
+        "serviceorders", ServiceOrder, "BiomedLink - Service Orders Report", "serviceorders.pdf",
+        ServiceOrder.arrival_date,
+        {"hospital": ServiceOrder.site_hospital, "engineer": ServiceOrder.engineer_name},
+        _draw_serviceorder,
+    ),
+}
+
+
+def parse_filters(params) -> dict:
+    """Pick the report filters out of a query-string mapping.
+
+    Dates are ``YYYY-MM-DD`` and inclusive; raises ValueError on a bad date.
+    """
+    filters = {}
+    for name in FILTER_NAMES:
+        value = (params.get(name) or "").strip()
+        if not value:
+            continue
+        if name in ("date_from", "date_to"):
+            value = datetime.strptime(value, "%Y-%m-%d").date()
+        filters[name] = value
+    return filters
+
+
+def _bound(column, value: date):
+    if isinstance(column.type, DateTime):
+        return datetime.combine(value, datetime.min.time())
+    return value
+
+
+def build_query(kind: str, filters: dict):
+    """Core select over the report table with ``filters`` applied, in id order.
+
+    A ``user_id`` filter (set by callers, never parsed from the query string)
+    limits the rows to that user's.
+    """
+    spec = REPORTS[kind]
+    table = spec.model.__table__
+    stmt = select(table)
+    if "user_id" in filters:
+        stmt = stmt.where(table.c.user_id == filters["user_id"])
+    if "date_from" in filters:
+        stmt = stmt.where(spec.date_column >= _bound(spec.date_column, filters["date_from"]))
+    if "date_to" in filters:
+        stmt = stmt.where(spec.date_column < _bound(spec.date_column, filters["date_to"] + timedelta(days=1)))
+    for name, column in spec.text_filters.items():
+        if name in filters:
+            stmt = stmt.where(column == filters[name])
+    return stmt.order_by(table.c.id)
+
+
+class PdfWriter:
+    """Lays out report rows with ReportLab into a private spooled temp file.
+
+    Not thread-safe; the engine drives one writer from one worker thread at a time.
+    """
+
+    def __init__(self, spec: ReportSpec, filters: dict):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+
+        self.spec = spec
+        self.file = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_BYTES)
+        self.height = letter[1]
+        self.canvas = canvas.Canvas(self.file, pagesize=letter)
+        self.canvas.setFont("Helvetica", 12)
+        self.y = self.height - 50
+        self.canvas.drawString(100, self.y, spec.title)
+        self.y -= 20
+        if filters:
+            self.canvas.setFont("Helvetica", 9)
+            self.canvas.drawString(100, self.y, "Filters: " + ", ".join(f"{k}={v}" for k, v in filters.items()))
+            self.canvas.setFont("Helvetica", 12)
+        self.y -= 10
+
+    def line(self, x, text, x2=None, text2=None, gap=20):
+        if self.y < 100:
+            self.canvas.showPage()
+            self.canvas.setFont("Helvetica", 12)
+            self.y = self.height - 50
+        self.canvas.drawString(x, self.y, text)
+        if x2 is not None:
+            self.canvas.drawString(x2, self.y, text2)
+        self.y -= gap
+
+    def draw_rows(self, rows):
+        for row in rows:
+            self.spec.draw_row(self, row)
+
+    def finish(self):
+        self.canvas.save()
+        self.file.seek(0)
+        return self.file
+
+
+async def render_report(db, kind: str, filters: dict):
+    """Stream matching rows from the database in batches and render them off the loop.
+
+    Returns ``(fileobj, stats)``; the caller owns and must close ``fileobj``.
+    """
+    spec = REPORTS[kind]
+    started = time.perf_counter()
+    writer = await asyncio.to_thread(PdfWriter, spec, filters)
+    rows = 0
+    try:
+        stmt = build_query(kind, filters).execution_options(yield_per=REPORT_BATCH_SIZE)
+        result = await db.stream(stmt)
+        async for batch in result.partitions():
+            await asyncio.to_thread(writer.draw_rows, batch)
+            rows += len(batch)
+        fileobj = await asyncio.to_thread(writer.finish)
+    except BaseException:
+        writer.file.close()
+        raise
+
+    elapsed = time.perf_counter() - started
+    metrics.REPORT_RENDER.observe(elapsed, kind)
+    metrics.REPORT_ROWS.inc(kind, amount=rows)
+    stats = {
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    logger.info("%s report: %d rows in %.3fs (%.1f rows/s)", kind, rows, elapsed, stats["rows_per_sec"])
+    return fileobj, stats
+
+
+async def iter_file(fileobj, chunk_size: int = REPORT_CHUNK_SIZE):
+    try:
+        while True:
+            chunk = await asyncio.to_thread(fileobj.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
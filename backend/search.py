@@ -0,0 +1,175 @@
+import html
+import re
+from datetime import date
+
+from sqlalchemy import DDL, event, text
+
+from backend.db.models import JobCard, ServiceOrder
+from backend.pagination import clamp_page_size
+
+SEARCH_PAGE_SIZE_DEFAULT = 20
+TS_CONFIG = "english"
+
+# Searchable sources: the title column is ranked above the other text fields.
+SOURCES = {
+    "jobcards": {
+        "table": JobCard.__table__,
+        "title": "equipment_name",
+        "fields": ("job_description", "spare_parts_used"),
+        "date": "date_of_service",
+    },
+    "serviceorders": {
+        "table": ServiceOrder.__table__,
+        "title": "site_hospital",
+        "fields": ("mission_purpose", "spare_parts"),
+        "date": "arrival_date",
+    },
+}
+
+# Private-use characters mark highlights so snippets can be HTML-escaped
+# before the <mark> tags are put in.
+_START, _STOP = "\ue000", "\ue001"
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# ---------------------- Index DDL ---------------------
+# Postgres keeps a generated tsvector column with a GIN index; SQLite keeps an
+# external-content FTS5 table maintained by triggers. Either way the index
+# follows inserts, updates and deletes (including bulk COPY/executemany)
+# without application code. The same statements ship in the Alembic migration.
+
+def postgres_ddl(kind: str) -> list:
+    source = SOURCES[kind]
+    table = source["table"].name
+    vector = f"setweight(to_tsvector('{TS_CONFIG}', coalesce({source['title']}, '')), 'A')"
+    for field in source["fields"]:
+        vector += f" || setweight(to_tsvector('{TS_CONFIG}', coalesce({field}, '')), 'B')"
+    return [
+        f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED",
+        f"CREATE INDEX ix_{table}_search ON {table} USING gin (search_vector)",
+    ]
+
+
+def sqlite_ddl(kind: str) -> list:
+    source = SOURCES[kind]
+    table = source["table"].name
+    columns = [source["title"], *source["fields"]]
+    names = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    fts = f"{table}_fts"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='id', "
+        "tokenize='porter unicode61')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new}); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+# Databases created with metadata.create_all get the index too.
+for _kind, _source in SOURCES.items():
+    for _statement in postgres_ddl(_kind):
+        event.listen(_source["table"], "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+    for _statement in sqlite_ddl(_kind):
+        event.listen(_source["table"], "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+
+# ---------------------- Queries ---------------------
+def fts5_query(query: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, the last as a prefix."""
+    words = _WORD_RE.findall(query)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+
+def _postgres_sql() -> str:
+    hits = []
+    for kind, source in SOURCES.items():
+        table = source["table"].name
+        hits.append(
+            f"SELECT '{kind}' AS kind, t.id, t.{source['title']} AS title, t.{source['date']}::date AS date, "
+            f"ts_rank(t.search_vector, q.query) AS score "
+            f"FROM {table} t, q WHERE t.search_vector @@ q.query AND t.user_id = :user_id"
+        )
+    # Headlines are costly, so they are only computed for the rows on the page.
+    joins = []
+    documents = []
+    for i, (kind, source) in enumerate(SOURCES.items()):
+        alias = f"s{i}"
+        joins.append(f"LEFT JOIN {source['table'].name} {alias} ON page.kind = '{kind}' AND {alias}.id = page.id")
+        fields = " || ' ' || ".join(f"coalesce({alias}.{f}, '')" for f in (*source["fields"], source["title"]))
+        documents.append(f"WHEN '{kind}' THEN {fields}")
+    return (
+        f"WITH q AS (SELECT websearch_to_tsquery('{TS_CONFIG}', :q) AS query), "
+        f"hits AS ({' UNION ALL '.join(hits)}), "
+        "page AS (SELECT * FROM hits ORDER BY score DESC, kind, id DESC LIMIT :limit OFFSET :offset) "
+        "SELECT page.kind, page.id, page.title, page.date, page.score, "
+        f"ts_headline('{TS_CONFIG}', CASE page.kind {' '.join(documents)} END, q.query, :options) AS snippet "
+        f"FROM page CROSS JOIN q {' '.join(joins)} "
+        "ORDER BY page.score DESC, page.kind, page.id DESC"
+    )
+
+
+def _sqlite_sql() -> str:
+    hits = []
+    for kind, source in SOURCES.items():
+        table = source["table"].name
+        fts = f"{table}_fts"
+        hits.append(
+            f"SELECT '{kind}' AS kind, t.id AS id, t.{source['title']} AS title, date(t.{source['date']}) AS date, "
+            f"-bm25({fts}, 4.0) AS score, snippet({fts}, -1, :start, :stop, '…', 16) AS snippet "
+            f"FROM {fts} JOIN {table} t ON t.id = {fts}.rowid "
+            f"WHERE {fts} MATCH :q AND t.user_id = :user_id"
+        )
+    return (
+        f"SELECT * FROM ({' UNION ALL '.join(hits)}) "
+        "ORDER BY score DESC, kind, id DESC LIMIT :limit OFFSET :offset"
+    )
+
+
+def _highlight(snippet: str) -> str:
+    return html.escape(snippet or "").replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+async def search(db, user_id: int, query: str, page: int = 1, limit: int = SEARCH_PAGE_SIZE_DEFAULT) -> dict:
+    """Ranked matches across job cards and service orders owned by ``user_id``.
+
+    Snippets are HTML-escaped with matches wrapped in ``<mark>``.
+    """
+    limit = clamp_page_size(limit)
+    page = max(1, int(page))
+    params = {"user_id": user_id, "limit": limit + 1, "offset": (page - 1) * limit}
+
+    if db.get_bind().dialect.name == "postgresql":
+        sql = _postgres_sql()
+        params.update(
+            q=query,
+            options=f"StartSel={_START}, StopSel={_STOP}, MaxWords=30, MinWords=10, MaxFragments=2",
+        )
+    else:
+        sql = _sqlite_sql()
+        params.update(q=fts5_query(query), start=_START, stop=_STOP)
+        if not params["q"]:
+            return {"items": [], "page": page, "limit": limit, "has_more": False}
+
+    rows = (await db.execute(text(sql), params)).all()
+    items = []
+    for row in rows[:limit]:
+        value = row.date
+        items.append({
+            "kind": row.kind,
+            "id": row.id,
+            "title": row.title,
+            "date": value.isoformat() if isinstance(value, date) else value,
+            "score": round(float(row.score), 4),
+            "snippet": _highlight(row.snippet),
+        })
+    return {"items": items, "page": page, "limit": limit, "has_more": len(rows) > limit}
@@ -0,0 +1,69 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# bcrypt cost factor; changing it rehashes existing passwords on their next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # "thread" or "process"
+# Calls allowed to queue for a worker before further callers wait on the loop.
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+_pwd_context = None
+_executor = None
+_pending = None
+
+
+def get_pwd_context():
+    # passlib is imported on first use (in each worker process, for the process executor).
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        # ``rounds`` pins min/max/default, so hashes of any other cost report needs_update.
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+    return _pwd_context
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            # bcrypt releases the GIL, so threads hash in parallel.
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+    return _executor
+
+
+def shutdown():
+    global _executor, _pending
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    _pending = None
+
+
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def _verify_and_update(password: str, hashed: str):
+    return get_pwd_context().verify_and_update(password, hashed)
+
+
+async def _run(fn, *args):
+    global _pending
+    if _pending is None:
+        _pending = asyncio.Semaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_PENDING)
+    async with _pending:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, hashed: str):
+    """Return ``(valid, new_hash)``; ``new_hash`` is set when the stored hash should be upgraded."""
+    return await _run(_verify_and_update, password, hashed)
@@ -1,39 +1,49 @@
 from fastapi import Request, Form
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from backend.db.database import get_db
 from backend.db.models import ServiceOrder
+from backend.analytics import record_serviceorders
+from backend.page_cache import bump_data_version
+from backend.report_cache import report_cache
 
-async def handle_serviceorder(request: Request):
+def parse_serviceorder(data) -> dict:
+    """Validate one service order (form fields or an import row) into ServiceOrder column values.
+
+    Raises ValueError if a field is missing or malformed.
+    """
+    for name in ("engineer_name", "site_hospital", "arrival_date", "return_date"):
+        if not (data.get(name) or "").strip():
+            raise ValueError(f"{name} is required")
+
+    mission_fee = float(data.get("mission_fee") or 0)
+    transport_fee = float(data.get("transport_fee") or 0)
+    return {
+        "engineer_name": data.get("engineer_name"),
+        "site_hospital": data.get("site_hospital"),
+        "mission_purpose": data.get("mission_purpose"),
+        "spare_parts": data.get("spare_parts"),
+        "arrival_date": datetime.strptime(data.get("arrival_date").strip(), "%Y-%m-%d").date(),
+        "return_date": datetime.strptime(data.get("return_date").strip(), "%Y-%m-%d").date(),
+        "mission_fee": mission_fee,
+        "transport_fee": transport_fee,
+        "total_cost": mission_fee + transport_fee,
+    }
+
+async def handle_serviceorder(request: Request, db: AsyncSession):
     form = await request.form()
     user = request.session.get("user")
     user_id = user["user_id"] if user else None
 
-    engineer_name = form.get("engineer_name")
-    site_hospital = form.get("site_hospital")
-    mission_purpose = form.get("mission_purpose")
-    spare_parts = form.get("spare_parts")
-    arrival_date = datetime.strptime(form.get("arrival_date"), "%Y-%m-%d")
-    return_date = datetime.strptime(form.get("return_date"), "%Y-%m-%d")
-    mission_fee = float(form.get("mission_fee", 0))
-    transport_fee = float(form.get("transport_fee", 0))
-    total_cost = mission_fee + transport_fee
-
-    db = next(get_db())
+    values = parse_serviceorder(form)
     new_order = ServiceOrder(
-        engineer_name=engineer_name,
-        site_hospital=site_hospital,
-        mission_purpose=mission_purpose,
-        spare_parts=spare_parts,
-        arrival_date=arrival_date,
-        return_date=return_date,
-        mission_fee=mission_fee,
-        transport_fee=transport_fee,
-        total_cost=total_cost,
+        **values,
         user_id=user_id
     )
     db.add(new_order)
-    db.commit()
+    await record_serviceorders(db, [values])
+    await bump_data_version(db, user_id)
+    await db.commit()
+    report_cache.invalidate("serviceorders")
 
     return RedirectResponse("/serviceorder", status_code=302)
@@ -0,0 +1,342 @@
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from backend.db.models import SessionRecord
+
+# Signing key shared by every worker: SESSION_SECRET, else the contents of
+# SESSION_SECRET_FILE (created on first start if missing).
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+SESSION_SECRET_FILE = os.getenv("SESSION_SECRET_FILE", ".session_secret")
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "cookie")  # "cookie", "db" or "redis"
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_COOKIE = os.getenv("SESSION_COOKIE", "session")
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", str(14 * 24 * 3600)))
+SESSION_HTTPS_ONLY = os.getenv("SESSION_HTTPS_ONLY", "0") == "1"
+# Server-side backends: how long a worker may serve session data from memory,
+# and how often expired sessions are purged.
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "5"))
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+SESSION_CLEANUP_INTERVAL = float(os.getenv("SESSION_CLEANUP_INTERVAL", "300"))
+
+logger = logging.getLogger(__name__)
+
+
+def load_secret() -> str:
+    """Return the configured signing key, creating SESSION_SECRET_FILE atomically if needed."""
+    if SESSION_SECRET:
+        return SESSION_SECRET
+    try:
+        with open(SESSION_SECRET_FILE) as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+    except FileNotFoundError:
+        pass
+    tmp_path = f"{SESSION_SECRET_FILE}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(secrets.token_hex(32))
+    try:
+        # link() fails if another worker won the race; everyone then reads the winner's key.
+        os.link(tmp_path, SESSION_SECRET_FILE)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp_path)
+    with open(SESSION_SECRET_FILE) as f:
+        return f.read().strip()
+
+
+# ---------------------- Stores ---------------------
+class SessionStore:
+    """Interface for server-side session storage. Data is a JSON string."""
+
+    async def load(self, sid: str):
+        raise NotImplementedError
+
+    async def save(self, sid: str, data: str, max_age: int):
+        raise NotImplementedError
+
+    async def delete(self, sid: str):
+        raise NotImplementedError
+
+    async def cleanup(self) -> int:
+        """Remove expired sessions; stores that expire keys themselves return 0."""
+        return 0
+
+    async def close(self):
+        pass
+
+
+class DatabaseSessionStore(SessionStore):
+    """Sessions in the ``sessions`` table of the app database (SQLite or Postgres)."""
+
+    def _upsert(self, bind, values: dict):
+        if bind.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(SessionRecord).values(values)
+        return stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={"data": stmt.excluded.data, "expires_at": stmt.excluded.expires_at},
+        )
+
+    async def load(self, sid: str):
+        from backend.db.database import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as db:
+            return await db.scalar(
+                select(SessionRecord.data).where(SessionRecord.id == sid, SessionRecord.expires_at > datetime.utcnow())
+            )
+
+    async def save(self, sid: str, data: str, max_age: int):
+        from backend.db.database import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as db:
+            expires_at = datetime.utcnow() + timedelta(seconds=max_age)
+            await db.execute(self._upsert(db.get_bind(), {"id": sid, "data": data, "expires_at": expires_at}))
+            await db.commit()
+
+    async def delete(self, sid: str):
+        from backend.db.database import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(SessionRecord).where(SessionRecord.id == sid))
+            await db.commit()
+
+    async def cleanup(self) -> int:
+        from backend.db.database import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(delete(SessionRecord).where(SessionRecord.expires_at <= datetime.utcnow()))
+            await db.commit()
+            return result.rowcount
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions as Redis keys with a TTL; requires the optional 'redis' package."""
+
+    def __init__(self, url: str = SESSION_REDIS_URL, prefix: str = "session:"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def load(self, sid: str):
+        data = await self.client.get(self.prefix + sid)
+        return data.decode() if data is not None else None
+
+    async def save(self, sid: str, data: str, max_age: int):
+        await self.client.set(self.prefix + sid, data, ex=max_age)
+
+    async def delete(self, sid: str):
+        await self.client.delete(self.prefix + sid)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+STORES = {
+    "db": DatabaseSessionStore,
+    "redis": RedisSessionStore,
+}
+
+
+# ---------------------- Middleware ---------------------
+class ServerSessionMiddleware:
+    """Like Starlette's SessionMiddleware, but the cookie carries only a signed
+    session id and the data lives in ``store``.
+
+    Loaded sessions are cached per worker for SESSION_CACHE_TTL seconds, so a
+    logout on one worker can take that long to reach the others. Unchanged
+    sessions are written back only once half of their lifetime has passed.
+    """
+
+    def __init__(self, app, store: SessionStore, secret_key: str, session_cookie: str = SESSION_COOKIE,
+                 max_age: int = SESSION_MAX_AGE, https_only: bool = SESSION_HTTPS_ONLY):
+        import itsdangerous
+
+        self.app = app
+        self.store = store
+        self.signer = itsdangerous.TimestampSigner(secret_key)
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.security_flags = "httponly; samesite=lax" + ("; secure" if https_only else "")
+        self._cache = OrderedDict()  # sid -> (cached_until, data_json, saved_at)
+        self.hits = 0
+        self.misses = 0
+
+    def _sid_from_cookie(self, scope):
+        from itsdangerous import BadSignature
+        from starlette.requests import HTTPConnection
+
+        cookie = HTTPConnection(scope).cookies.get(self.session_cookie)
+        if not cookie:
+            return None
+        try:
+            return self.signer.unsign(cookie, max_age=self.max_age).decode()
+        except BadSignature:
+            return None
+
+    async def _load(self, sid: str):
+        entry = self._cache.get(sid)
+        if entry is not None and entry[0] > time.monotonic():
+            self._cache.move_to_end(sid)
+            self.hits += 1
+            return entry[1], entry[2]
+        self.misses += 1
+        data = await self.store.load(sid)
+        if data is None:
+            self._cache.pop(sid, None)
+            return None, None
+        # The store does not say when the session was last written; treat it as now.
+        saved_at = entry[2] if entry is not None else time.time()
+        self._remember(sid, data, saved_at)
+        return data, saved_at
+
+    def _remember(self, sid: str, data: str, saved_at: float):
+        self._cache[sid] = (time.monotonic() + SESSION_CACHE_TTL, data, saved_at)
+        self._cache.move_to_end(sid)
+        while len(self._cache) > SESSION_CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+
+        sid = self._sid_from_cookie(scope)
+        initial, saved_at = await self._load(sid) if sid else (None, None)
+        scope["session"] = json.loads(initial) if initial else {}
+
+        async def send_wrapper(message):
+            nonlocal sid
+            if message["type"] == "http.response.start":
+                from starlette.datastructures import MutableHeaders
+
+                headers = MutableHeaders(scope=message)
+                if scope["session"]:
+                    data = json.dumps(scope["session"], sort_keys=True)
+                    new = initial is None
+                    if new:
+                        sid = secrets.token_urlsafe(32)
+                    stale = saved_at is None or time.time() - saved_at > self.max_age / 2
+                    if new or data != initial or stale:
+                        await self.store.save(sid, data, self.max_age)
+                        self._remember(sid, data, time.time())
+                        cookie = self.signer.sign(sid).decode()
+                        headers.append(
+                            "Set-Cookie",
+                            f"{self.session_cookie}={cookie}; path=/; Max-Age={self.max_age}; {self.security_flags}",
+                        )
+                elif initial is not None:
+                    # The session was cleared (logout).
+                    await self.store.delete(sid)
+                    self._cache.pop(sid, None)
+                    headers.append(
+                        "Set-Cookie",
+                        f"{self.session_cookie}=null; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT; "
+                        f"{self.security_flags}",
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def stats(self) -> dict:
+        return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+class SessionBackend:
+    """Signing key, store and cleanup task for the configured SESSION_BACKEND.
+
+    ``start``/``close`` are called from the app lifespan; the middleware calls
+    ``start`` itself if the lifespan did not run.
+    """
+
+    def __init__(self):
+        self.secret = None
+        self.store = None
+        self.middleware = None  # the ServerSessionMiddleware in use, for stats
+        self._cleanup_task = None
+
+    def start(self):
+        if self.secret is not None:
+            return
+        if SESSION_BACKEND != "cookie" and SESSION_BACKEND not in STORES:
+            raise ValueError(f"Unknown SESSION_BACKEND {SESSION_BACKEND!r}")
+        self.secret = load_secret()
+        if SESSION_BACKEND in STORES:
+            self.store = STORES[SESSION_BACKEND]()
+            self._cleanup_task = asyncio.get_running_loop().create_task(self._cleanup_loop())
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(SESSION_CLEANUP_INTERVAL)
+            try:
+                removed = await self.store.cleanup()
+                if removed:
+                    logger.info("Removed %d expired sessions", removed)
+            except Exception:
+                logger.exception("Session cleanup failed")
+
+    async def close(self):
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            self._cleanup_task = None
+        if self.store is not None:
+            await self.store.close()
+            self.store = None
+        self.secret = None
+
+    def stats(self) -> dict:
+        stats = {"started": self.secret is not None}
+        if self.middleware is not None:
+            stats.update(self.middleware.stats())
+        return stats
+
+
+session_backend = SessionBackend()
+
+
+class SessionMiddleware:
+    """Session middleware for the configured SESSION_BACKEND.
+
+    "cookie" keeps the data in a signed cookie (Starlette's SessionMiddleware);
+    "db" and "redis" keep it server-side. Either way the signing key is the
+    persistent one from ``load_secret``, so sessions survive restarts and work
+    across workers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.inner = None
+        self._store = None
+
+    def _build(self):
+        if SESSION_BACKEND == "cookie":
+            from starlette.middleware.sessions import SessionMiddleware as CookieSessionMiddleware
+
+            return CookieSessionMiddleware(
+                self.app, secret_key=session_backend.secret, session_cookie=SESSION_COOKIE,
+                max_age=SESSION_MAX_AGE, https_only=SESSION_HTTPS_ONLY,
+            )
+        session_backend.middleware = ServerSessionMiddleware(self.app, session_backend.store, session_backend.secret)
+        return session_backend.middleware
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.app(scope, receive, send)
+        session_backend.start()
+        # Rebuild after the backend was restarted (e.g. a second lifespan in tests).
+        if self.inner is None or self._store is not session_backend.store:
+            self.inner = self._build()
+            self._store = session_backend.store
+        await self.inner(scope, receive, send)
@@ -0,0 +1,47 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import statistics
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def summarize(samples, elapsed):
+    return {
+        "count": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(samples) * 1000, 2) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2) if samples else 0.0,
+    }
+
+
+def prepare_environment(rounds: int, **env) -> str:
+    """Point the app at a throwaway SQLite database and scratch directories.
+
+    Must run before anything from ``backend`` is imported, since its settings
+    are read at import time. Returns the scratch directory.
+    """
+    tmpdir = tempfile.mkdtemp(prefix="biomedlink-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    os.environ["BCRYPT_ROUNDS"] = str(rounds)
+    os.environ["REPORT_CACHE_DIR"] = os.path.join(tmpdir, "report_cache")
+    os.environ["ATTACHMENT_DIR"] = os.path.join(tmpdir, "attachments")
+    os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(tmpdir, "template_cache")
+    os.environ["SESSION_SECRET_FILE"] = os.path.join(tmpdir, "session_secret")
+    os.environ.update({k: str(v) for k, v in env.items()})
+    # Templates and static files are resolved relative to the repository root.
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    return tmpdir
@@ -0,0 +1,99 @@
+"""Login throughput and tail latency under concurrency.
+
+Boots the app in-process against a throwaway SQLite database, registers a
+handful of users and fires concurrent POST /login requests at it. While the
+logins run, a probe hits GET / every few milliseconds to show how responsive
+the event loop stays.
+
+    python benchmarks/login_bench.py --requests 200 --concurrency 20 --rounds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import time
+
+from common import prepare_environment, summarize
+
+
+async def run(args):
+    import httpx
+    from backend.db.database import Base, engine
+    from backend.main import app
+    from backend.security import PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS
+
+    Base.metadata.create_all(bind=engine)
+    transport = httpx.ASGITransport(app=app)
+    users = [(f"bench{i}@example.com", f"pw-{i}") for i in range(args.users)]
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for email, password in users:
+            await client.post("/register", data={"email": email, "password": password, "role": "staff"})
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+        failures = 0
+
+        async def login(i):
+            nonlocal failures
+            email, password = users[i % len(users)]
+            async with semaphore:
+                started = time.perf_counter()
+                r = await client.post("/login", data={"email": email, "password": password})
+                latencies.append(time.perf_counter() - started)
+                if r.status_code != 302:
+                    failures += 1
+
+        probe_latencies = []
+        done = asyncio.Event()
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.005)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "bcrypt_rounds": int(os.environ["BCRYPT_ROUNDS"]),
+        "hash_executor": PASSWORD_HASH_EXECUTOR,
+        "hash_workers": PASSWORD_HASH_WORKERS,
+        "failures": failures,
+        "login": summarize(latencies, elapsed),
+        "event_loop_probe": summarize(probe_latencies, elapsed),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost to benchmark")
+    parser.add_argument("--output", help="write the JSON result here as well as to stdout")
+    args = parser.parse_args(argv)
+
+    tmpdir = prepare_environment(args.rounds)
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Throughput and tail latency for every main route, with baseline comparison.
+
+Boots the app in-process against a freshly seeded SQLite database and a local
+stub LLM, logs in a pool of staff users and drives each scenario in turn at
+the given concurrency. Results (throughput, p50/p95/p99 per scenario) are
+written as JSON; with --baseline they are compared against an earlier run and
+the exit status is 1 if any scenario regressed beyond --tolerance.
+
+    python benchmarks/routes_bench.py --output before.json
+    python benchmarks/routes_bench.py --baseline before.json --output after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+from common import ROOT, prepare_environment, summarize
+
+QUESTIONS = [
+    "How do I replace the lamp?", "What does error E07 mean?", "How often should I calibrate?",
+    "How do I clean the optics?", "Why is the pump showing an occlusion alarm?", "How do I run the self-test?",
+    "What is the warm-up time?", "How do I change the printer paper?", "Which reagents are supported?",
+    "How do I reset the device?",
+]
+SEARCH_TERMS = ["pump error E07", "replaced lamp", "battery", "door seal", "calibration visit", "fuse"]
+
+
+# ---------------------- Scenarios ---------------------
+# Each takes (client, rng, ctx) and returns the response; the expected status
+# codes follow. Redirects are not followed, so 302 is success for form posts.
+
+async def login(client, rng, ctx):
+    email = ctx["emails"][rng.randrange(len(ctx["emails"]))]
+    return await client.post("/login", data={"email": email, "password": ctx["password"]})
+
+
+async def dashboard(client, rng, ctx):
+    return await client.get("/pharmalab")
+
+
+async def jobcard_list(client, rng, ctx):
+    return await client.get("/jobcard")
+
+
+async def serviceorder_list(client, rng, ctx):
+    return await client.get("/serviceorder")
+
+
+async def api_jobcards(client, rng, ctx):
+    return await client.get("/api/jobcards", params={"limit": 50})
+
+
+async def admin_users(client, rng, ctx):
+    return await client.get("/admin/users")
+
+
+async def submit_jobcard(client, rng, ctx):
+    return await client.post("/submit-jobcard", data={
+        "engineer_name": "Bench Engineer",
+        "equipment_name": rng.choice(["Infusion pump", "Centrifuge", "Ventilator"]),
+        "maintenance_type": rng.choice(["Preventive", "Corrective"]),
+        "date_of_service": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "job_description": "Reported pump error E07; replaced fuse and verified operation.",
+        "spare_parts_used": "fuse",
+    })
+
+
+async def submit_serviceorder(client, rng, ctx):
+    day = rng.randint(1, 27)
+    return await client.post("/submit-serviceorder", data={
+        "engineer_name": "Bench Engineer",
+        "site_hospital": rng.choice(["Aga Khan Hospital", "Coast General Hospital"]),
+        "mission_purpose": "Corrective visit: lamp failure",
+        "spare_parts": "lamp",
+        "arrival_date": f"2025-06-{day:02d}",
+        "return_date": f"2025-06-{day + 1:02d}",
+        "mission_fee": "200",
+        "transport_fee": "40",
+    })
+
+
+async def download_jobcards(client, rng, ctx):
+    return await client.get("/download-jobcards")
+
+
+async def download_serviceorders(client, rng, ctx):
+    return await client.get("/download-serviceorders-pdf")
+
+
+async def search(client, rng, ctx):
+    return await client.get("/search", params={"q": rng.choice(SEARCH_TERMS)})
+
+
+async def analytics(client, rng, ctx):
+    return await client.get("/analytics/missions", params={"group_by": "site"})
+
+
+async def ask(client, rng, ctx):
+    return await client.post("/ask", data={"query": rng.choice(QUESTIONS), "instrument": ctx["instrument"]})
+
+
+async def ask_routed(client, rng, ctx):
+    return await client.post("/ask", data={"query": rng.choice(QUESTIONS)})
+
+
+async def ask_batch(client, rng, ctx):
+    # A 20-question checklist; the scenario's latency is the whole batch.
+    items = [{"instrument": ctx["instrument"], "query": f"{rng.choice(QUESTIONS)} ({rng.randrange(10 ** 6)})"}
+             for _ in range(20)]
+    return await client.post("/ask/batch", json={"items": items})
+
+
+async def bulk_delete(client, rng, ctx):
+    # Last in the default order, since it removes rows the other scenarios read.
+    # Ids are drawn from all users' job cards; only the client's own are deleted.
+    ids = rng.sample(range(1, ctx["jobcards"] + 1), min(10, ctx["jobcards"]))
+    return await client.post("/bulk-delete/jobcards", json={"ids": ids})
+
+
+SCENARIOS = {
+    "login": (login, {302}),
+    "dashboard": (dashboard, {200}),
+    "jobcard_list": (jobcard_list, {200}),
+    "serviceorder_list": (serviceorder_list, {200}),
+    "api_jobcards": (api_jobcards, {200}),
+    "admin_users": (admin_users, {200}),
+    "submit_jobcard": (submit_jobcard, {302}),
+    "submit_serviceorder": (submit_serviceorder, {302}),
+    "download_jobcards": (download_jobcards, {200}),
+    "download_serviceorders": (download_serviceorders, {200}),
+    "search": (search, {200}),
+    "analytics": (analytics, {200}),
+    "ask": (ask, {200}),
+    "ask_routed": (ask_routed, {200}),
+    "ask_batch": (ask_batch, {200}),
+    "bulk_delete": (bulk_delete, {200}),
+}
+
+
+async def run_scenario(name, clients, ctx, args):
+    fn, expected = SCENARIOS[name]
+    rng = random.Random(f"{args.seed}-{name}")
+    latencies = []
+    errors = {}
+
+    async def worker(k, count):
+        client = clients[k % len(clients)]
+        for _ in range(count):
+            started = time.perf_counter()
+            try:
+                r = await fn(client, rng, ctx)
+                await r.aread()
+                status = r.status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if status not in expected:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    for _ in range(args.warmup):
+        await fn(clients[0], rng, ctx)
+
+    counts = [args.requests // args.concurrency] * args.concurrency
+    for k in range(args.requests % args.concurrency):
+        counts[k] += 1
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(k, n) for k, n in enumerate(counts) if n))
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies, elapsed)
+    result["errors"] = sum(errors.values())
+    if errors:
+        result["error_statuses"] = errors
+    return result
+
+
+async def run(args):
+    import httpx
+
+    from seed import PASSWORD, seed, user_email
+    from backend import security
+    from backend.db.database import async_engine
+    from backend.main import app
+
+    dataset = await seed(args.users, args.jobcards, args.serviceorders, args.seed)
+    ctx = {
+        "emails": [user_email(i) for i in range(args.users)],
+        "password": PASSWORD,
+        "instrument": args.instrument,
+        "jobcards": dataset["jobcards"],
+    }
+    names = args.scenarios or list(SCENARIOS)
+    results = {}
+
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            # One client (and so one session cookie) per bench user.
+            clients = [httpx.AsyncClient(transport=transport, base_url="http://bench")
+                       for _ in range(min(args.users, args.concurrency))]
+            try:
+                for i, client in enumerate(clients):
+                    r = await client.post("/login", data={"email": user_email(i), "password": PASSWORD})
+                    if r.status_code != 302:
+                        raise RuntimeError(f"bench login failed with {r.status_code}")
+                for name in names:
+                    results[name] = await run_scenario(name, clients, ctx, args)
+                    print(f"{name:24} {results[name]['throughput_rps']:9.1f} rps  "
+                          f"p50 {results[name]['p50_ms']:8.2f} ms  p95 {results[name]['p95_ms']:8.2f} ms  "
+                          f"p99 {results[name]['p99_ms']:8.2f} ms  errors {results[name]['errors']}", file=sys.stderr)
+            finally:
+                for client in clients:
+                    await client.aclose()
+    finally:
+        security.shutdown()
+        await async_engine.dispose()
+
+    return {"meta": metadata(args, dataset), "scenarios": results}
+
+
+def metadata(args, dataset):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "bcrypt_rounds": args.rounds,
+        "llm_latency_s": args.llm_latency,
+        "dataset": dataset,
+    }
+
+
+def compare(result, baseline, tolerance):
+    """List scenarios whose latency rose or throughput fell by more than ``tolerance``."""
+    regressions = []
+    for name, current in result["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if before[metric] > 0 and current[metric] > before[metric] * (1 + tolerance):
+                regressions.append({"scenario": name, "metric": metric,
+                                    "baseline": before[metric], "current": current[metric]})
+        if current["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append({"scenario": name, "metric": "throughput_rps",
+                                "baseline": before["throughput_rps"], "current": current["throughput_rps"]})
+        if current["errors"] > before.get("errors", 0):
+            regressions.append({"scenario": name, "metric": "errors",
+                                "baseline": before.get("errors", 0), "current": current["errors"]})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=5, help="unrecorded requests per scenario")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--jobcards", type=int, default=200, help="seeded job cards per user")
+    parser.add_argument("--serviceorders", type=int, default=100, help="seeded service orders per user")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub LLM delay in seconds")
+    parser.add_argument("--instrument", default="humacount5", help="manual used by /ask")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), help="default: all")
+    parser.add_argument("--output", help="write the JSON result here as well as to stdout")
+    parser.add_argument("--baseline", help="JSON result of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change, default 20%%")
+    args = parser.parse_args(argv)
+    # The run changes directory to the repository root.
+    args.output = args.output and os.path.abspath(args.output)
+    args.baseline = args.baseline and os.path.abspath(args.baseline)
+
+    from stub_llm import StubLLM
+
+    with StubLLM(latency=args.llm_latency) as llm:
+        tmpdir = prepare_environment(args.rounds, GROQ_API_KEY="bench", GROQ_API_URL=llm.url)
+        try:
+            result = asyncio.run(run(args))
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        result["regressions"] = compare(result, baseline, args.tolerance)
+        result["baseline_commit"] = baseline.get("meta", {}).get("commit")
+        status = 1 if result["regressions"] else 0
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
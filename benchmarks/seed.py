@@ -0,0 +1,151 @@
+"""Deterministic dataset generator for benchmarks.
+
+Creates staff users plus job cards and service orders for each of them,
+then rebuilds the analytics summaries. The same ``--seed`` always produces
+the same rows.
+
+    python benchmarks/seed.py --database sqlite:///bench.db --users 20 --jobcards 500 --serviceorders 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from common import ROOT
+
+PASSWORD = "bench-password"
+BATCH_SIZE = 1000
+
+EQUIPMENT = [
+    "Infusion pump", "Patient monitor", "Defibrillator", "Ventilator", "Centrifuge",
+    "Humalyzer 3500", "Humacount 5", "Autoclave", "ECG machine", "Ultrasound scanner",
+]
+MAINTENANCE_TYPES = ["Preventive", "Corrective", "Calibration", "Installation"]
+FAULTS = [
+    "pump error E07", "occlusion alarm", "lamp failure", "battery not charging", "display flicker",
+    "pressure sensor drift", "door interlock fault", "printer jam", "leak at the valve", "no power on start",
+]
+ACTIONS = [
+    "replaced lamp", "recalibrated sensor", "replaced battery pack", "cleaned optics", "updated firmware",
+    "tightened fittings", "replaced fuse", "reseated main board", "replaced door seal", "ran full self-test",
+]
+PARTS = ["lamp", "fuse", "battery pack", "door seal", "pressure sensor", "main board", "tubing set", ""]
+SITES = [
+    "Kenyatta National Hospital", "Moi Teaching Hospital", "Aga Khan Hospital", "Coast General Hospital",
+    "Nakuru Level 5", "Kisumu County Hospital", "Machakos Level 5", "Nyeri County Referral",
+]
+
+
+def user_email(i: int) -> str:
+    return f"bench{i}@example.com"
+
+
+def _jobcard(rng, user_id, start):
+    fault, action = rng.choice(FAULTS), rng.choice(ACTIONS)
+    return {
+        "engineer_name": f"Engineer {rng.randint(1, 25)}",
+        "equipment_name": rng.choice(EQUIPMENT),
+        "maintenance_type": rng.choice(MAINTENANCE_TYPES),
+        "date_of_service": datetime.combine(start + timedelta(days=rng.randint(0, 729)), datetime.min.time()),
+        "job_description": f"Reported {fault}; {action} and verified operation.",
+        "spare_parts_used": rng.choice(PARTS),
+        "file_path": "",
+        "user_id": user_id,
+    }
+
+
+def _serviceorder(rng, user_id, start):
+    arrival = start + timedelta(days=rng.randint(0, 729))
+    mission_fee = float(rng.randrange(50, 500, 10))
+    transport_fee = float(rng.randrange(10, 150, 5))
+    return {
+        "engineer_name": f"Engineer {rng.randint(1, 25)}",
+        "site_hospital": rng.choice(SITES),
+        "mission_purpose": f"{rng.choice(MAINTENANCE_TYPES)} visit: {rng.choice(FAULTS)}",
+        "spare_parts": rng.choice(PARTS),
+        "arrival_date": arrival,
+        "return_date": arrival + timedelta(days=rng.randint(0, 3)),
+        "mission_fee": mission_fee,
+        "transport_fee": transport_fee,
+        "total_cost": mission_fee + transport_fee,
+        "user_id": user_id,
+    }
+
+
+async def seed(users: int = 10, jobcards: int = 200, serviceorders: int = 100, seed: int = 1) -> dict:
+    """Populate the database at DATABASE_URL; counts are per user."""
+    from sqlalchemy import insert
+
+    from backend import analytics, search  # noqa: F401  (search registers its index DDL)
+    from backend.db.database import AsyncSessionLocal, Base, async_engine
+    from backend.db.models import JobCard, ServiceOrder, User
+    from backend.security import hash_password
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    # One hash is enough: every bench user shares the password.
+    hashed = await hash_password(PASSWORD)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            insert(User).returning(User.id),
+            [{"email": user_email(i), "password": hashed, "role": "staff"} for i in range(users)],
+        )
+        user_ids = list(result.scalars())
+        for model, make, per_user in ((JobCard, _jobcard, jobcards), (ServiceOrder, _serviceorder, serviceorders)):
+            rows = []
+            for user_id in user_ids:
+                for _ in range(per_user):
+                    rows.append(make(rng, user_id, start))
+                    if len(rows) >= BATCH_SIZE:
+                        await db.execute(insert(model), rows)
+                        rows = []
+            if rows:
+                await db.execute(insert(model), rows)
+        await db.commit()
+        await analytics.rebuild(db)
+
+    return {
+        "users": users,
+        "jobcards": users * jobcards,
+        "serviceorders": users * serviceorders,
+        "seed": seed,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", required=True, help="SQLAlchemy URL, e.g. sqlite:///bench.db")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--jobcards", type=int, default=200, help="job cards per user")
+    parser.add_argument("--serviceorders", type=int, default=100, help="service orders per user")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost for the shared password")
+    args = parser.parse_args(argv)
+
+    os.environ["DATABASE_URL"] = args.database
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    sys.path.insert(0, ROOT)
+
+    async def _run():
+        from backend import security
+        from backend.db.database import async_engine
+        try:
+            return await seed(args.users, args.jobcards, args.serviceorders, args.seed)
+        finally:
+            security.shutdown()
+            await async_engine.dispose()
+
+    print(json.dumps(asyncio.run(_run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Worker startup cost: import time of backend.main and time to first response.
+
+Each run uses a fresh interpreter. Import time is measured in-process around
+``import backend.main``; time to first response is measured from spawning
+uvicorn until GET / answers 200. The database URL points at a file that is
+never created unless startup touches the database, which the result reports.
+With --max-import-ms / --max-first-request-ms the exit status is 1 when a
+median exceeds its budget, so the numbers can be tracked in CI.
+
+    python benchmarks/startup_bench.py --runs 5 --max-first-request-ms 3000
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from common import ROOT
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import backend.main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def _env(tmpdir: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'startup.db')}",
+        "DB_CREATE_ALL": "0",
+        "REPORT_CACHE_DIR": os.path.join(tmpdir, "report_cache"),
+        "ATTACHMENT_DIR": os.path.join(tmpdir, "attachments"),
+        "TEMPLATE_CACHE_DIR": os.path.join(tmpdir, "template_cache"),
+        "SESSION_SECRET_FILE": os.path.join(tmpdir, "session_secret"),
+    })
+    return env
+
+
+def measure_import(env) -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def measure_first_request(env, timeout: float = 60.0) -> float:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited during startup:\n{proc.stderr.read().decode()}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("server did not answer in time")
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def slowest_imports(env, count: int) -> list:
+    """Heaviest modules imported directly by backend.main (``-X importtime``)."""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import backend.main"], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stderr
+    entries = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level == 1:
+            entries.append({"module": name.strip(), "cumulative_ms": round(int(cumulative) / 1000, 1)})
+    return sorted(entries, key=lambda e: e["cumulative_ms"], reverse=True)[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--slowest", type=int, default=10, help="list this many heaviest imports")
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import time exceeds this")
+    parser.add_argument("--max-first-request-ms", type=float, help="fail if the median time to first response exceeds this")
+    parser.add_argument("--output", help="write the JSON result here as well as to stdout")
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix="biomedlink-startup-")
+    try:
+        env = _env(tmpdir)
+        # Warm the bytecode cache so every run measures the same thing.
+        measure_import(env)
+        imports = [measure_import(env) for _ in range(args.runs)]
+        first_requests = [measure_first_request(env) for _ in range(args.runs)]
+        result = {
+            "runs": args.runs,
+            "python": sys.version.split()[0],
+            "import_ms": {
+                "median": round(statistics.median(imports) * 1000, 1),
+                "min": round(min(imports) * 1000, 1),
+                "max": round(max(imports) * 1000, 1),
+            },
+            "first_request_ms": {
+                "median": round(statistics.median(first_requests) * 1000, 1),
+                "min": round(min(first_requests) * 1000, 1),
+                "max": round(max(first_requests) * 1000, 1),
+            },
+            "database_touched": os.path.exists(os.path.join(tmpdir, "startup.db")),
+            "slowest_imports": slowest_imports(env, args.slowest) if args.slowest else [],
+        }
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    failures = []
+    if args.max_import_ms is not None and result["import_ms"]["median"] > args.max_import_ms:
+        failures.append(f"import {result['import_ms']['median']} ms > {args.max_import_ms} ms")
+    if args.max_first_request_ms is not None and result["first_request_ms"]["median"] > args.max_first_request_ms:
+        failures.append(f"first request {result['first_request_ms']['median']} ms > {args.max_first_request_ms} ms")
+    result["failures"] = failures
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
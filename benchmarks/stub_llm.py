@@ -0,0 +1,94 @@
+"""Local stand-in for the Groq chat completions API.
+
+Answers after a fixed delay, optionally as an SSE token stream, so /ask can be
+load-tested without network access or API costs.
+
+    python benchmarks/stub_llm.py --port 8765 --latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+ANSWER = "Check the power supply, reseat the lamp connector and run the self-test before replacing parts."
+
+
+def create_app(latency: float = 0.2, stream_delay: float = 0.01) -> Starlette:
+    async def chat(request):
+        body = await request.json()
+        if body.get("stream"):
+            async def tokens():
+                await asyncio.sleep(latency)
+                for word in ANSWER.split(" "):
+                    chunk = {"choices": [{"delta": {"content": word + " "}}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(stream_delay)
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(tokens(), media_type="text/event-stream")
+        await asyncio.sleep(latency)
+        return JSONResponse({"choices": [{"message": {"content": ANSWER}}]})
+
+    return Starlette(routes=[Route("/v1/chat/completions", chat, methods=["POST"])])
+
+
+class StubLLM:
+    """Runs the stub with uvicorn on a background thread."""
+
+    def __init__(self, latency: float = 0.2, port: int = 0):
+        self.latency = latency
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1/chat/completions"
+
+    def start(self):
+        import uvicorn
+
+        if not self.port:
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", 0))
+                self.port = s.getsockname()[1]
+        config = uvicorn.Config(create_app(self.latency), host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("stub LLM server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    uvicorn.run(create_app(args.latency), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# The backend reads its configuration at import time. Point the database and
+# everything the app writes (caches, attachments, the session secret) at a
+# scratch directory, so the suite never touches a real database or the tree.
+_scratch = tempfile.mkdtemp(prefix="biomedlink-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_scratch}/app.db",
+    "DB_CREATE_ALL": "1",
+    "SESSION_SECRET_FILE": os.path.join(_scratch, "session_secret"),
+    "REPORT_CACHE_DIR": os.path.join(_scratch, "report_cache"),
+    "TEMPLATE_CACHE_DIR": os.path.join(_scratch, "template_cache"),
+    "ATTACHMENT_DIR": os.path.join(_scratch, "attachments"),
+})
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from backend.ai_cache import AnswerCache
+
+KEY = ("pump", "hash", "how do i reset it")
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def scenario():
+        cache = AnswerCache()
+        started = asyncio.Event()
+        release = asyncio.Event()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            started.set()
+            await release.wait()
+            return "answer"
+
+        leader = asyncio.create_task(cache.get_or_fetch(KEY, fetch))
+        await started.wait()
+        follower = asyncio.create_task(cache.get_or_fetch(KEY, fetch))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        release.set()
+
+        assert await follower == "answer"
+        assert calls == 1
+        assert cache.get(KEY) == "answer"
+        assert cache.stats()["inflight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_fetch_finishes_and_is_cached_when_every_waiter_is_cancelled():
+    async def scenario():
+        cache = AnswerCache()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "answer"
+
+        waiter = asyncio.create_task(cache.get_or_fetch(KEY, fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        release.set()
+        for _ in range(3):
+            await asyncio.sleep(0)
+
+        assert cache.get(KEY) == "answer"
+        assert cache.stats()["inflight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_fetch_error_reaches_every_waiter_and_is_not_cached():
+    async def scenario():
+        cache = AnswerCache()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            raise RuntimeError("upstream down")
+
+        waiters = [asyncio.create_task(cache.get_or_fetch(KEY, fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache.get(KEY) is None
+        assert cache.stats()["inflight"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,79 @@
+import asyncio
+import io
+import json
+from datetime import date
+
+from sqlalchemy import delete, event, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from backend import analytics, bulk_delete, bulk_import
+from backend.db.database import Base
+from backend.db.models import MaintenanceSummary, MissionSpendSummary, ServiceOrder, User
+
+
+def ndjson(rows) -> io.BytesIO:
+    return io.BytesIO("".join(json.dumps(row) + "\n" for row in rows).encode())
+
+
+def jobcards(n, day):
+    return ndjson({"date_of_service": f"2024-01-{day:02d}", "equipment_name": f"Pump{i % 3}",
+                   "maintenance_type": ("Preventive", "Corrective")[i % 2]} for i in range(n))
+
+
+def serviceorders(n, site):
+    return ndjson({"engineer_name": "E", "site_hospital": site, "arrival_date": f"2024-0{1 + i % 2}-10",
+                   "return_date": "2024-03-01", "mission_fee": str(10 + i), "transport_fee": "2.5"} for i in range(n))
+
+
+async def summaries(db) -> tuple:
+    maintenance = (await db.execute(select(MaintenanceSummary.__table__).order_by(
+        MaintenanceSummary.equipment_name, MaintenanceSummary.maintenance_type))).all()
+    spend = (await db.execute(select(MissionSpendSummary.__table__).order_by(
+        MissionSpendSummary.site_hospital, MissionSpendSummary.month))).all()
+    return maintenance, spend
+
+
+def test_summaries_match_a_rebuild_after_inserts_and_deletes(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'analytics.db'}")
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def foreign_keys(dbapi_connection, record):
+            dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            async with AsyncSession(engine) as db:
+                db.add_all([User(id=1, email="a@b.c", password="x", role="staff"),
+                            User(id=2, email="d@e.f", password="x", role="staff")])
+                await db.commit()
+
+                for user_id, day, site in ((1, 5, "General"), (2, 20, "Central")):
+                    await bulk_import.import_records(db, "jobcards", jobcards(7, day), "ndjson", user_id)
+                    await bulk_import.import_records(db, "serviceorders", serviceorders(5, site), "ndjson", user_id)
+                    await bulk_import.import_records(db, "serviceorders", serviceorders(2, "Shared"), "ndjson", user_id)
+
+                criteria = bulk_delete.parse_criteria("jobcards", {"ids": [1, 2, 3, 4]})
+                assert await bulk_delete.delete_records(db, "jobcards", 1, criteria) == 4
+                criteria = bulk_delete.parse_criteria("serviceorders", {"before": "2024-02-01"})
+                assert await bulk_delete.delete_records(db, "serviceorders", 1, criteria) == 4
+
+                # As the admin route does: subtract the user's rows, then let the cascade delete them.
+                await analytics.forget_user(db, 2)
+                await db.execute(delete(User).where(User.id == 2))
+                await db.commit()
+                assert await db.scalar(select(ServiceOrder.id).where(ServiceOrder.user_id == 2)) is None
+
+                incremental = await summaries(db)
+                await analytics.rebuild(db)
+                assert incremental == await summaries(db)
+
+                maintenance, spend = incremental
+                assert sum(row.job_count for row in maintenance) == 3
+                assert {(row.site_hospital, row.month, row.order_count) for row in spend} == {
+                    ("General", "2024-02", 2), ("Shared", "2024-02", 1)}
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from backend import ask_batch
+from backend.ai_assistant import AIAssistantError
+from backend.ai_cache import AnswerCache
+
+DELAYS = {"slow": 0.06, "medium": 0.03, "fast": 0.0}
+
+
+def retrieval(item):
+    return {"instrument": item["instrument"], "content_hash": "hash", "sections": ["manual text"],
+            "sources": ["manual.txt"]}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = AnswerCache()
+    monkeypatch.setattr(ask_batch, "answer_cache", cache)
+
+    def retrieve_all(items):
+        return [(None, "Manual not found for ghost.") if item["instrument"] == "ghost" else (retrieval(item), None)
+                for item in items]
+
+    async def request_completion(query, context):
+        await asyncio.sleep(DELAYS.get(query, 0))
+        if query == "broken":
+            raise AIAssistantError("AI service not available (missing API key).")
+        return f"answer to {query}"
+
+    monkeypatch.setattr(ask_batch, "retrieve_all", retrieve_all)
+    monkeypatch.setattr(ask_batch, "request_completion", request_completion)
+    return cache
+
+
+def items(*queries, instrument="pump"):
+    return [{"instrument": instrument, "query": q} for q in queries]
+
+
+def collect(batch, **kwargs):
+    async def run():
+        return [result async for result in ask_batch.run_batch(batch, **kwargs)]
+
+    return asyncio.run(run())
+
+
+def test_results_come_in_input_order_by_default(cache):
+    batch = items("slow", "medium", "broken", "fast") + items("fast", instrument="ghost")
+    *results, summary = collect(batch, concurrency=5)
+
+    assert [r["index"] for r in results] == [0, 1, 2, 3, 4]
+    assert [r.get("response") for r in results] == ["answer to slow", "answer to medium", None, "answer to fast", None]
+    assert results[2]["error"] == "AI service not available (missing API key)."
+    assert results[4]["error"] == "Manual not found for ghost."
+    assert summary["done"] and summary["items"] == 5 and summary["failed"] == 2
+
+
+def test_completion_order_on_request(cache):
+    *results, summary = collect(items("slow", "medium", "fast"), concurrency=3, ordered=False)
+    assert [r["index"] for r in results] == [2, 1, 0]
+    assert summary["failed"] == 0
+
+
+def test_parse_batch_defaults_to_input_order():
+    assert ask_batch.parse_batch({"items": ["a"]})[2] is True
+    assert ask_batch.parse_batch({"items": ["a"], "ordered": False})[2] is False
+
+
+def test_item_whose_shared_fetch_is_cancelled_still_reports(cache):
+    async def run():
+        batch = items("slow", "fast")
+        key = cache.make_key("pump", "hash", "slow")
+        # Another request started the same fetch; the batch joins it, then it dies.
+        other = asyncio.create_task(cache.get_or_fetch(key, lambda: asyncio.sleep(1, "late")))
+        consumer = asyncio.create_task(asyncio.wait_for(collect_async(batch), 2))
+        await asyncio.sleep(0.02)
+        cache._inflight[key].cancel()
+        results = await consumer
+        with pytest.raises(asyncio.CancelledError):
+            await other
+        return results
+
+    async def collect_async(batch):
+        return [result async for result in ask_batch.run_batch(batch, concurrency=2)]
+
+    *results, summary = asyncio.run(run())
+    assert [r["index"] for r in results] == [0, 1]
+    assert results[0]["error"] == "The answer was cancelled."
+    assert results[1]["response"] == "answer to fast"
+    assert summary["failed"] == 1
+
+
+def test_closing_the_stream_cancels_unsent_items(cache):
+    async def run():
+        stream = ask_batch.run_batch(items("fast", "slow", "slow2", "slow3"), concurrency=1)
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.1)
+        return first
+
+    first = asyncio.run(run())
+    assert first["response"] == "answer to fast"
+    assert cache.get(cache.make_key("pump", "hash", "slow3")) is None
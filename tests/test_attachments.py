@@ -0,0 +1,72 @@
+import asyncio
+import io
+import os
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from backend import attachments
+from backend.db.database import Base
+from backend.db.models import Attachment
+
+
+class Upload:
+    def __init__(self, data: bytes, content_type="text/plain"):
+        self.file = io.BytesIO(data)
+        self.content_type = content_type
+
+    async def read(self, size: int) -> bytes:
+        return self.file.read(size)
+
+
+def with_session(tmp_path, scenario):
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'attachments.db'}")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            async with AsyncSession(engine) as db:
+                await scenario(db)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+def test_identical_uploads_share_one_blob_until_the_last_release(tmp_path):
+    async def scenario(db):
+        first = await attachments.store_upload(db, Upload(b"same bytes"))
+        await db.commit()
+        second = await attachments.store_upload(db, Upload(b"same bytes"))
+        await db.commit()
+        other = await attachments.store_upload(db, Upload(b"other bytes"))
+        await db.commit()
+
+        sha = attachments.sha_from_path(first)
+        assert first == second != other
+        assert await db.scalar(select(Attachment.refcount).where(Attachment.sha256 == sha)) == 2
+        assert os.path.exists(attachments.blob_path(sha))
+
+        assert await attachments.release(db, attachments.count_refs([first])) == []
+        assert await db.scalar(select(Attachment.refcount).where(Attachment.sha256 == sha)) == 1
+        assert os.path.exists(attachments.blob_path(sha))
+
+        assert await attachments.release(db, attachments.count_refs([second])) == [sha]
+        assert await db.scalar(select(Attachment.sha256).where(Attachment.sha256 == sha)) is None
+        assert not os.path.exists(attachments.blob_path(sha))
+        assert os.path.exists(attachments.blob_path(attachments.sha_from_path(other)))
+
+    with_session(tmp_path, scenario)
+
+
+def test_reference_rolls_back_with_its_transaction(tmp_path):
+    async def scenario(db):
+        path = await attachments.store_upload(db, Upload(b"kept"))
+        await db.commit()
+        await attachments.store_upload(db, Upload(b"kept"))
+        await db.rollback()
+
+        sha = attachments.sha_from_path(path)
+        assert await db.scalar(select(Attachment.refcount).where(Attachment.sha256 == sha)) == 1
+
+    with_session(tmp_path, scenario)
@@ -0,0 +1,118 @@
+import asyncio
+import io
+import json
+import os
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from backend import bulk_import
+from backend.db.database import Base
+from backend.db.models import JobCard, MaintenanceSummary, User
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def ndjson(rows) -> io.BytesIO:
+    return io.BytesIO("".join(json.dumps(row) + "\n" for row in rows).encode())
+
+
+def jobcard(n, **extra) -> dict:
+    return {"date_of_service": "2024-01-02", "equipment_name": f"Pump{n}", "maintenance_type": "Preventive", **extra}
+
+
+def run_import(url, fileobj, batch_size=1000):
+    """Import ``fileobj`` into a fresh database; returns (result, stored rows, summary total, data_version)."""
+    async def scenario():
+        engine = create_async_engine(url)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+                await conn.run_sync(Base.metadata.create_all)
+            async with AsyncSession(engine) as db:
+                db.add(User(id=1, email="a@b.c", password="x", role="staff"))
+                await db.commit()
+                result = await bulk_import.import_records(db, "jobcards", fileobj, "ndjson", 1, batch_size)
+                stored = await db.scalar(select(func.count()).select_from(JobCard))
+                summary = await db.scalar(select(func.coalesce(func.sum(MaintenanceSummary.job_count), 0)))
+                version = await db.scalar(select(User.data_version).where(User.id == 1))
+            return result, stored, summary, version
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(scenario())
+
+
+def fail_second_batch(monkeypatch):
+    """Make the summary update of the second batch fail, after its rows were written."""
+    record = bulk_import.RECORDERS["jobcards"]
+    calls = 0
+
+    async def failing(db, rows):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise OperationalError("UPDATE maintenance_summary", None, RuntimeError("disk I/O error"))
+        await record(db, rows)
+
+    monkeypatch.setitem(bulk_import.RECORDERS, "jobcards", failing)
+
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    return f"sqlite+aiosqlite:///{tmp_path / 'import.db'}"
+
+
+@pytest.fixture
+def postgres_url():
+    pytest.importorskip("asyncpg")
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    return TEST_POSTGRES_URL
+
+
+def test_invalid_rows_are_reported_and_the_rest_inserted(sqlite_url):
+    rows = [jobcard(1), jobcard(2), jobcard(3, date_of_service="notadate"), jobcard(4)]
+    data = ndjson(rows).getvalue().replace(b"\n", b"\n{oops\n", 1)
+    result, stored, summary, version = run_import(sqlite_url, io.BytesIO(data))
+
+    assert result["inserted"] == stored == summary == 3
+    assert result["failed"] == 2
+    assert [e["row"] for e in result["errors"]] == [2, 4]
+    assert result["errors"][0]["error"].startswith("invalid JSON")
+    assert version == 1
+
+
+def test_rejected_batch_is_rolled_back_and_reported(sqlite_url, monkeypatch):
+    fail_second_batch(monkeypatch)
+    result, stored, summary, version = run_import(sqlite_url, ndjson(jobcard(n) for n in range(5)), batch_size=2)
+
+    assert result["method"] == "executemany"
+    assert result["inserted"] == stored == summary == 3
+    assert result["failed"] == 2
+    assert [e["row"] for e in result["errors"]] == [3, 4]
+    assert all(e["error"].startswith("batch rejected by database: OperationalError") for e in result["errors"])
+    assert result["batches"] == 2
+    assert version == 2
+
+
+def test_copy_batch_rejected_by_postgres_is_reported(postgres_url):
+    # Postgres refuses NUL characters in text, so COPY fails the second batch.
+    rows = [jobcard(1), jobcard(2), jobcard(3), jobcard(4, job_description="bad\u0000byte"), jobcard(5)]
+    result, stored, summary, version = run_import(postgres_url, ndjson(rows), batch_size=2)
+
+    assert result["method"] == "copy"
+    assert result["inserted"] == stored == summary == 3
+    assert [e["row"] for e in result["errors"]] == [3, 4]
+    assert all(e["error"].startswith("batch rejected by database: DBAPIError") for e in result["errors"])
+
+
+def test_copied_rows_roll_back_with_their_batch(postgres_url, monkeypatch):
+    fail_second_batch(monkeypatch)
+    result, stored, summary, version = run_import(postgres_url, ndjson(jobcard(n) for n in range(5)), batch_size=2)
+
+    assert result["method"] == "copy"
+    assert result["inserted"] == stored == summary == 3
+    assert [e["row"] for e in result["errors"]] == [3, 4]
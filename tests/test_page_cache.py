@@ -0,0 +1,39 @@
+from fastapi.testclient import TestClient
+
+from backend.main import app
+
+ORDER = {"engineer_name": "E", "site_hospital": "General", "arrival_date": "2024-01-10",
+         "return_date": "2024-01-12", "mission_fee": "10", "transport_fee": "5"}
+
+
+def revalidate(client, path, etag):
+    return client.get(path, headers={"If-None-Match": etag})
+
+
+def test_static_page_answers_304_for_a_matching_etag():
+    with TestClient(app) as client:
+        etag = client.get("/").headers["etag"]
+        assert revalidate(client, "/", etag).status_code == 304
+        assert revalidate(client, "/", f'W/{etag}, "other"').status_code == 304
+        assert revalidate(client, "/", '"other"').status_code == 200
+
+
+def test_list_page_etag_follows_the_users_data():
+    with TestClient(app) as client:
+        client.post("/register", data={"email": "etag@b.c", "password": "pw", "role": "staff"})
+        client.post("/login", data={"email": "etag@b.c", "password": "pw"})
+
+        first = client.get("/serviceorder")
+        etag = first.headers["etag"]
+        assert first.status_code == 200
+        assert revalidate(client, "/serviceorder", etag).status_code == 304
+
+        client.post("/submit-serviceorder", data=ORDER, follow_redirects=False)
+        changed = revalidate(client, "/serviceorder", etag)
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+        assert "General" in changed.text
+
+        # Logged out there is no data version to key an ETag on.
+        client.get("/logout")
+        assert "etag" not in client.get("/serviceorder").headers
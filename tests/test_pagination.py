@@ -0,0 +1,75 @@
+import asyncio
+import base64
+import json
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from backend.db.database import Base
+from backend.db.models import JobCard, ServiceOrder
+from backend.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+
+JOBCARD_ORDER = [JobCard.date_of_service, JobCard.id]
+
+
+def raw_cursor(items) -> str:
+    return base64.urlsafe_b64encode(json.dumps(items).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trips():
+    when = datetime(2024, 3, 1, 9, 30)
+    assert decode_cursor(encode_cursor([when, 7]), JOBCARD_ORDER) == [when, 7]
+    assert decode_cursor(encode_cursor([date(2024, 3, 1), 7]), [ServiceOrder.arrival_date, ServiceOrder.id]) == [
+        date(2024, 3, 1), 7]
+    assert decode_cursor(encode_cursor([None, 7]), JOBCARD_ORDER) == [None, 7]
+
+
+@pytest.mark.parametrize("cursor", [
+    "!!!",
+    raw_cursor({"v": 1}),
+    raw_cursor([["v", {"a": 1}], ["v", 1]]),
+    raw_cursor([["dt", "2024-03-01T09:30:00"]]),
+    raw_cursor([["dt", "2024-03-01T09:30:00"], ["v", 1], ["v", 2]]),
+    raw_cursor([["dt", "2024-03-01T09:30:00"], ["v", "1"]]),
+    raw_cursor([["dt", "2024-03-01T09:30:00"], ["v", 1.5]]),
+    raw_cursor([["dt", "2024-03-01T09:30:00"], ["v", True]]),
+    raw_cursor([["dt", "2024-03-01T09:30:00"], ["v", None]]),
+    raw_cursor([["dt", "not a date"], ["v", 1]]),
+    raw_cursor([["dt", 20240301], ["v", 1]]),
+    raw_cursor([["d", "2024-03-01"], ["v", 1]]),
+    raw_cursor([["v", "2024-03-01"], ["v", 1]]),
+    raw_cursor([1, 2]),
+    raw_cursor([["dt", "2024-03-01T09:30:00", "x"], ["v", 1]]),
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, JOBCARD_ORDER)
+
+
+def test_keyset_pages_cover_every_row_once(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pages.db'}")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            async with AsyncSession(engine) as db:
+                # Two rows share each date, so the id tie-breaker decides the order.
+                db.add_all(JobCard(id=i, date_of_service=datetime(2024, 1, 1 + i // 2), user_id=1) for i in range(7))
+                await db.commit()
+
+                seen, cursor = [], None
+                while True:
+                    rows, cursor = await keyset_page(db, select(JobCard), JOBCARD_ORDER, cursor, limit=2)
+                    seen += [row.id for row in rows]
+                    if cursor is None:
+                        break
+                assert seen == [6, 5, 4, 3, 2, 1, 0]
+
+                with pytest.raises(InvalidCursor):
+                    await keyset_page(db, select(JobCard), JOBCARD_ORDER, raw_cursor([["v", {"a": 1}], ["v", 1]]))
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())